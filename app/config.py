@@ -0,0 +1,76 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Настройки сервиса, читаются из переменных окружения и файла .env."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Сколько файлов обрабатывается одновременно в пуле детекции
+    max_concurrent_jobs: int = 1
+    # Сколько запросов может ожидать свободного места в пуле, остальные получают 503
+    max_queued_jobs: int = 4
+
+    # Максимальный размер загружаемого файла и размер части при записи, байты
+    max_upload_size: int = 1024 ** 3
+    upload_chunk_size: int = 1024 * 1024
+
+    # Бэкенд инференса моделей: torch, onnx или openvino
+    model_backend: str = "torch"
+    # Точность весов по умолчанию: fp32, fp16 (openvino), int8-dynamic, int8-static (onnx)
+    model_precision: str = "fp32"
+    # Изображения для калибровки int8-static
+    quantization_calibration_dir: str = "models/calibration"
+    # Загрузка и пробный прогон моделей по умолчанию при старте сервиса,
+    # иначе модели загружаются при первом запросе
+    model_warmup: bool = False
+    # Адаптивное разрешение: время инференса модели m при imgsz 640 на этом CPU (мс),
+    # наибольший вход модели без плиток и размеры моделей, из которых идет выбор
+    inference_latency_ms: float = 400.0
+    adaptive_max_imgsz: int = 1280
+    adaptive_model_sizes: str = "n,s,m"
+    # Сегментный режим видео (нужен ffmpeg): видео длиннее MIN_SEGMENT_FRAMES
+    # кадров делится на отрезки, которые обрабатываются в SEGMENT_WORKERS
+    # процессах; по умолчанию 1 процесс - режим отключен
+    segment_workers: int = 1
+    min_segment_frames: int = 900
+
+    # Микробатчинг: одиночные изображения параллельных запросов (пакетная
+    # загрузка, MAX_CONCURRENT_JOBS > 1) собираются в батч до MICRO_BATCH_SIZE
+    # изображений или MICRO_BATCH_WAIT_MS миллисекунд, 1 - отключен
+    micro_batch_size: int = 8
+    micro_batch_wait_ms: float = 5.0
+    # Наибольшее число файлов и суммарный размер файлов одного пакетного
+    # запроса (байты; тело проверяется по Content-Length до чтения)
+    max_batch_files: int = 100
+    max_batch_upload_size: int = 2 * 1024 ** 3
+
+    # Изображение без детекций и видео, в котором по кэшу детекций нет ни
+    # одного бокса, отдаются жесткой ссылкой на исходный файл без перекодирования
+    no_detection_passthrough: bool = True
+
+    # Кэши хранятся вне uploads, который раздается как статические файлы.
+    # Кэш готовых результатов, 0 - кэш отключен
+    result_cache_dir: str = "cache/results"
+    result_cache_max_size: int = 5 * 1024 ** 3
+    # Кэш боксов по кадрам для повторного размытия без инференса, 0 - отключен
+    detection_cache_dir: str = "cache/detections"
+    detection_cache_max_size: int = 1024 ** 3
+
+    # Очередь задач /api/jobs: число потоков, из них только для изображений
+    job_workers: int = 2
+    image_lane_workers: int = 1
+    # Повышение приоритета ожидающей задачи, мегапикселей в секунду
+    job_aging_rate: float = 50.0
+    # Записи завершенных, неудачных и отмененных задач хранятся не дольше
+    # JOB_HISTORY_TTL секунд и не больше JOB_HISTORY_MAX штук
+    job_history_ttl: float = 3600.0
+    job_history_max: int = 1000
+    # Профилирование (cProfile) каждой задачи очереди, профиль сохраняется
+    # в PROFILE_DIR под идентификатором задачи; для отдельной задачи - поле
+    # profile запроса
+    profile_jobs: bool = False
+    profile_dir: str = "cache/profiles"
+
+
+settings = Settings()
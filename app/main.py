@@ -1,14 +1,35 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from app.routers import video
+from app.config import settings
+from app.ml.tools.segmented import shutdown_segmented_processors
+from app.routers import jobs, video
+from app.routers.video import too_large_response, warm_up_models
+from app.tools.metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, REGISTRY
+from app.tools.upload import UploadTooLargeError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Прогрев моделей до приема запросов (если включен в настройках),
+    остановка процессов сегментного режима при завершении"""
+    if settings.model_warmup:
+        await run_in_threadpool(warm_up_models)
+    yield
+    await run_in_threadpool(shutdown_segmented_processors)
+
 
 # Создание экземпляра FastAPI приложения
 app = FastAPI(
     title="My API",
     description="API с поддержкой CORS",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Настройка CORS middleware
@@ -19,6 +40,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Запас на заголовки multipart и поля формы сверх размера самого файла
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# Пакетные загрузки: несколько файлов в одном теле запроса
+BATCH_UPLOAD_PATHS = {"/api/uploadfiles"}
+
+
+def max_request_size(path: str) -> int:
+    """Наибольший размер тела запроса без запаса на форму; размер каждого
+    файла проверяется отдельно при сохранении (save_upload_file)."""
+    if path in BATCH_UPLOAD_PATHS:
+        return settings.max_batch_upload_size
+    return settings.max_upload_size
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Отклонение слишком больших загрузок по Content-Length до чтения тела"""
+    content_length = request.headers.get("content-length")
+    if (
+        request.method == "POST"
+        and content_length is not None
+        and content_length.isdigit()
+        and int(content_length) > max_request_size(request.url.path) + UPLOAD_FORM_OVERHEAD
+    ):
+        return too_large_response(UploadTooLargeError(max_request_size(request.url.path)))
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def observe_request_time(request: Request, call_next):
+    """Время обработки запроса по шаблону маршрута (без id в пути)"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
 # Монтирование папки uploads для раздачи медиафайлов
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -27,8 +90,14 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 async def read_root():
     return {"message": "Hello World"}
 
+# Метрики в текстовом формате Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Подключаем роутеры
 app.include_router(video.router, prefix="/api", tags=["api"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
 
 if __name__ == "__main__":
     import uvicorn
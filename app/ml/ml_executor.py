@@ -1,11 +1,28 @@
 
-from app.ml.tools.object_detector import MLObjectDetector
+from app.ml.tools.object_detector import (
+    GENERAL_MODEL_PATH,
+    IMAGE_EXTENSIONS,
+    MLObjectDetector,
+)
+from app.ml.tools.micro_batcher import MicroBatcher, get_micro_batcher
+from app.ml.tools.resolution import model_paths_for_size, plan_for_request
 from app.schemas.uploadfile import Options
-import queue
+from app.tools.detection_cache import DetectionCache, get_detection_cache
+from app.tools.metrics import JOB_SERVICE_SECONDS, JOB_WAIT_SECONDS, JOBS_TOTAL
+from app.tools.profiling import JobProfiler
+from app.tools.result_cache import ResultCache, get_result_cache
+import heapq
+import itertools
+import os
 import threading
 import time
+import uuid
+from collections import deque
 from enum import Enum
-from typing import Optional, Dict, Any
+from functools import partial
+from typing import Optional, Dict, Any, List
+
+import cv2
 
 class FileStatus(Enum):
     """Статусы обработки файлов"""
@@ -13,168 +30,505 @@ class FileStatus(Enum):
     PROCESSING = "processing" # Обрабатывается в данный момент
     COMPLETED = "completed"   # Успешно обработан
     ERROR = "error"          # Ошибка при обработке
+    CANCELLED = "cancelled"  # Отменен до начала обработки
+
+class JobClass(Enum):
+    """Классы задач, у каждого своя очередь"""
+    IMAGE = "image"
+    VIDEO = "video"
 
 class MLExecutor:
     """
-    Класс для последовательной обработки файлов в очереди.
-    Гарантирует обработку не более 1 файла одновременно.
+    Планировщик обработки файлов с несколькими рабочими потоками.
+
+    Изображения и видео стоят в отдельных очередях. Внутри очереди первой
+    берется задача с наименьшей оценкой объема работы (мегапиксели для
+    изображений, мегапиксели x кадры для видео), а ожидание постепенно
+    повышает приоритет, поэтому длинные задачи не голодают. Часть потоков
+    обслуживает только изображения, чтобы фото не ждали за длинными видео.
     """
-    
-    def __init__(self, model_path:str = "models/yolov11m-face.pt", confidence_threshold=0.5):
+
+    def __init__(
+        self,
+        model_path:str = "models/yolov11m-face.pt",
+        confidence_threshold=0.5,
+        workers: int = 2,
+        image_lane_workers: int = 1,
+        aging_rate: float = 50.0,
+        result_cache: Optional[ResultCache] = None,
+        detection_cache: Optional[DetectionCache] = None,
+        backend: str = "torch",
+        precision: str = "fp32",
+        calibration_dir: Optional[str] = None,
+        micro_batcher: Optional[MicroBatcher] = None,
+        profile: bool = False,
+        profile_dir: str = "cache/profiles",
+        passthrough: bool = True,
+        segment_workers: int = 1,
+        min_segment_frames: int = 900,
+        history_ttl: float = 3600.0,
+        history_max: int = 1000,
+    ):
         """
         Инициализация процессора файлов.
-        
+
+        Каждый рабочий поток создает свои детекторы перед обработкой первого
+        файла, чтобы создание обработчика не блокировало вызывающий код.
+        Веса моделей общие для всех потоков и роутеров процесса
+        (ModelRegistry) и загружаются один раз.
+
         Args:
-            process_function: Функция для обработки файла, принимает имя файла
+            model_path: Путь к весам модели детекции лиц
+            confidence_threshold: Порог уверенности детекций
+            workers: Общее число рабочих потоков
+            image_lane_workers: Сколько из них обрабатывают только изображения
+            aging_rate: На сколько мегапикселей в секунду ожидания
+                уменьшается оценка объема работы задачи
+            result_cache: Общий для всех потоков кэш результатов
+            detection_cache: Общий для всех потоков кэш детекций
+            backend: Бэкенд инференса моделей (torch, onnx, openvino)
+            precision: Точность весов для задач, где она не указана
+            calibration_dir: Каталог изображений для калибровки int8-static
+            micro_batcher: Общий батчер изображений параллельных задач
+            profile: Профилировать каждую задачу (иначе только задачи,
+                поставленные с profile=True)
+            profile_dir: Каталог профилей задач (вне раздаваемого uploads)
+            passthrough: Отдавать файлы без детекций без перекодирования
+            segment_workers: Число процессов сегментного режима видео
+                (1 - видео обрабатывается одним проходом)
+            min_segment_frames: Минимальная длина отрезка в кадрах
+            history_ttl: Сколько секунд хранится запись завершенной,
+                неудачной или отмененной задачи
+            history_max: Сколько таких записей хранится не больше
         """
-        self.detector = MLObjectDetector(model_path, confidence_threshold=confidence_threshold)
-        self.detector.initialize()
-        self._file_queue = queue.Queue()
+        self._detector_kwargs = dict(
+            face_model_path=model_path,
+            general_model_path=GENERAL_MODEL_PATH,
+            confidence_threshold=confidence_threshold,
+            result_cache=result_cache,
+            detection_cache=detection_cache,
+            backend=backend,
+            calibration_dir=calibration_dir,
+            micro_batcher=micro_batcher,
+            passthrough=passthrough,
+            segment_workers=segment_workers,
+            min_segment_frames=min_segment_frames,
+        )
+        self.precision = precision
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.workers = max(1, workers)
+        self.image_lane_workers = min(max(0, image_lane_workers), self.workers - 1)
+        self.aging_rate = aging_rate
+        self._queues: Dict[JobClass, List[tuple]] = {cls: [] for cls in JobClass}
+        self._sequence = itertools.count()
         self._file_statuses: Dict[str, Dict[str, Any]] = {}
+        # Завершенные задачи (время окончания, id) в порядке завершения
+        self._finished: deque = deque()
+        self.history_ttl = history_ttl
+        self.history_max = max(0, history_max)
         self._status_lock = threading.Lock()
-        self._worker_thread = None
+        self._queue_cond = threading.Condition(self._status_lock)
+        self._class_stats = {
+            cls: {"completed": 0, "errors": 0, "cancelled": 0,
+                  "wait_total": 0.0, "wait_max": 0.0,
+                  "service_total": 0.0, "service_max": 0.0}
+            for cls in JobClass
+        }
+        self._worker_threads: List[threading.Thread] = []
         self._running = False
-        
+
     def start(self):
         """Запуск обработчика"""
         if self._running:
             return
-            
+
         self._running = True
-        self._worker_thread = threading.Thread(target=self._worker, daemon=True)
-        self._worker_thread.start()
-        
+        for index in range(self.workers):
+            image_only = index < self.image_lane_workers
+            thread = threading.Thread(target=self._worker, args=(image_only,), daemon=True)
+            thread.start()
+            self._worker_threads.append(thread)
+
     def stop(self):
         """Остановка обработчика"""
-        self._running = False
-        if self._worker_thread:
-            self._worker_thread.join()
-            
-    def add_to_queue(self, filename: str, options: 'Options') -> bool:
+        with self._queue_cond:
+            self._running = False
+            self._queue_cond.notify_all()
+        for thread in self._worker_threads:
+            thread.join()
+        self._worker_threads = []
+
+    @staticmethod
+    def _classify(filename: str) -> JobClass:
+        if os.path.splitext(filename)[-1].lower() in IMAGE_EXTENSIONS:
+            return JobClass.IMAGE
+        return JobClass.VIDEO
+
+    @staticmethod
+    def _estimate_cost(filename: str, job_class: JobClass) -> float:
+        """Оценка объема работы в мегапикселях (для видео - по всем кадрам)"""
+        try:
+            if job_class == JobClass.IMAGE:
+                from PIL import Image
+
+                # Читается только заголовок файла
+                with Image.open(filename) as image:
+                    width, height = image.size
+                return width * height / 1e6
+
+            cap = cv2.VideoCapture(filename)
+            try:
+                frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+                height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            finally:
+                cap.release()
+            return frames * width * height / 1e6
+        except Exception:
+            # Нечитаемый файл быстро завершится ошибкой при обработке
+            return 0.0
+
+    def estimate_cost(self, filename: str) -> float:
+        """
+        Оценка объема работы файла для add_to_queue
+
+        Читает заголовок файла (видео открывается через OpenCV), поэтому из
+        асинхронного кода вызывается в пуле потоков.
+        """
+        return self._estimate_cost(filename, self._classify(filename))
+
+    def add_to_queue(self, filename: str, options: 'Options',
+                     content_hash: Optional[str] = None, profile: bool = False,
+                     cost: Optional[float] = None) -> str:
         """
         Добавить файл в очередь на обработку.
 
         Args:
             filename: Имя файла для обработки
             options: Объект Options с параметрами обработки
+            content_hash: sha256 содержимого файла, если уже известен
+            profile: Снять профиль обработки (cProfile), он сохраняется
+                в profile_dir, путь - в поле profile_path задачи
+            cost: Оценка объема работы из estimate_cost(), если уже
+                посчитана (иначе считается здесь, с чтением файла)
 
         Returns:
-            True если файл добавлен, False если уже в обработке
+            Уникальный идентификатор задачи
         """
-        with self._status_lock:
-            # Проверяем, не обрабатывается ли уже этот файл
-            if filename in self._file_statuses:
-                status = self._file_statuses[filename]["status"]
-                if status in [FileStatus.PENDING, FileStatus.PROCESSING]:
-                    return False
-
-            # Добавляем файл в очередь
-            self._file_statuses[filename] = {
+        job_id = uuid.uuid4().hex
+        job_class = self._classify(filename)
+        if cost is None:
+            cost = self._estimate_cost(filename, job_class)
+        added_time = time.time()
+        # Старение линейно и одинаково для всех задач, поэтому порядок по
+        # cost - aging_rate * (now - added_time) совпадает с порядком по ключу ниже
+        priority = cost + self.aging_rate * added_time
+
+        with self._queue_cond:
+            self._file_statuses[job_id] = {
+                "job_id": job_id,
+                "filename": filename,
+                "job_class": job_class.value,
+                "estimated_cost": round(cost, 3),
                 "status": FileStatus.PENDING,
-                "added_time": time.time(),
+                "added_time": added_time,
                 "start_time": None,
                 "end_time": None,
+                "progress_done": 0,
+                "progress_total": None,
                 "error": None,
-                "result": None
+                "result": None,
+                "profile": profile,
+                "profile_path": None,
             }
-        self._file_queue.put((filename, options))
-        return True
-        
-    def get_status(self, filename: str) -> Optional[Dict[str, Any]]:
+            heapq.heappush(
+                self._queues[job_class],
+                (priority, next(self._sequence), job_id, filename, options, content_hash),
+            )
+            self._queue_cond.notify_all()
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Отменить задачу, ожидающую в очереди.
+
+        Args:
+            job_id: Идентификатор задачи
+
+        Returns:
+            True если задача отменена, False если она не найдена или уже начата
+        """
+        with self._status_lock:
+            info = self._file_statuses.get(job_id)
+            if info is None or info["status"] != FileStatus.PENDING:
+                return False
+            # Запись остается в куче и пропускается при извлечении
+            info["status"] = FileStatus.CANCELLED
+            info["end_time"] = time.time()
+            self._class_stats[JobClass(info["job_class"])]["cancelled"] += 1
+            self._evict_finished(job_id, info["end_time"])
+            return True
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """
         Получить статус обработки файла.
-        
+
         Args:
-            filename: Имя файла
-            
+            job_id: Идентификатор задачи
+
         Returns:
-            Словарь с информацией о статусе или None если файл не найден
+            Словарь с информацией о статусе или None если задача не найдена
         """
         with self._status_lock:
-            if filename in self._file_statuses:
-                status_info = self._file_statuses[filename].copy()
+            if job_id in self._file_statuses:
+                status_info = self._file_statuses[job_id].copy()
                 status_info["status"] = status_info["status"].value
                 return status_info
             return None
-            
+
     def get_all_statuses(self) -> Dict[str, Dict[str, Any]]:
         """
-        Получить статусы всех файлов.
-        
+        Получить статусы всех задач.
+
         Returns:
-            Словарь со статусами всех файлов
+            Словарь со статусами всех задач по их идентификаторам
         """
         with self._status_lock:
             result = {}
-            for filename, info in self._file_statuses.items():
+            for job_id, info in self._file_statuses.items():
                 status_info = info.copy()
                 status_info["status"] = status_info["status"].value
-                result[filename] = status_info
+                result[job_id] = status_info
             return result
-            
+
+    def get_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Статистика очередей по классам задач.
+
+        Returns:
+            Для каждого класса: число ожидающих и завершенных задач, среднее и
+            максимальное время ожидания в очереди и время обработки (секунды)
+        """
+        with self._status_lock:
+            result = {}
+            for job_class, stats in self._class_stats.items():
+                pending = sum(
+                    1 for info in self._file_statuses.values()
+                    if info["job_class"] == job_class.value
+                    and info["status"] == FileStatus.PENDING
+                )
+                finished = stats["completed"] + stats["errors"]
+                result[job_class.value] = {
+                    "pending": pending,
+                    "completed": stats["completed"],
+                    "errors": stats["errors"],
+                    "cancelled": stats["cancelled"],
+                    "wait_avg": stats["wait_total"] / finished if finished else 0.0,
+                    "wait_max": stats["wait_max"],
+                    "service_avg": stats["service_total"] / finished if finished else 0.0,
+                    "service_max": stats["service_max"],
+                }
+            return result
+
     def clear_completed(self):
-        """Очистить записи о завершенных файлах"""
+        """Очистить записи о завершенных и отмененных задачах"""
         with self._status_lock:
             to_remove = []
-            for filename, info in self._file_statuses.items():
-                if info["status"] in [FileStatus.COMPLETED, FileStatus.ERROR]:
-                    to_remove.append(filename)
-                    
-            for filename in to_remove:
-                del self._file_statuses[filename]
-                
-    def _worker(self):
+            for job_id, info in self._file_statuses.items():
+                if info["status"] in [FileStatus.COMPLETED, FileStatus.ERROR, FileStatus.CANCELLED]:
+                    to_remove.append(job_id)
+
+            for job_id in to_remove:
+                del self._file_statuses[job_id]
+            self._finished.clear()
+
+    def _evict_finished(self, job_id: str, end_time: float) -> None:
+        """
+        Учесть завершение задачи и удалить записи старше history_ttl секунд
+        и сверх history_max; вызывается под self._status_lock
+        """
+        self._finished.append((end_time, job_id))
+        while self._finished and (
+            self._finished[0][0] < end_time - self.history_ttl
+            or len(self._finished) > self.history_max
+        ):
+            _, old_id = self._finished.popleft()
+            self._file_statuses.pop(old_id, None)
+
+    def _update_progress(self, job_id: str, done: int, total: int):
+        """Обновить прогресс задачи (кадры для видео, 0/1 для изображений)"""
+        with self._status_lock:
+            if job_id in self._file_statuses:
+                self._file_statuses[job_id]["progress_done"] = done
+                self._file_statuses[job_id]["progress_total"] = total
+
+    def _pop_job(self, image_only: bool) -> Optional[tuple]:
+        """Извлечь следующую задачу; вызывается под self._queue_cond"""
+        lanes = [JobClass.IMAGE] if image_only else list(JobClass)
+        while True:
+            candidates = [self._queues[cls] for cls in lanes if self._queues[cls]]
+            if not candidates:
+                return None
+            heap = min(candidates, key=lambda h: h[0][:2])
+            _, _, job_id, filename, options, content_hash = heapq.heappop(heap)
+            info = self._file_statuses.get(job_id)
+            if info is not None and info["status"] == FileStatus.PENDING:
+                return job_id, filename, options, content_hash
+
+    def _finish(self, job_id: str, status: FileStatus, result: Optional[str] = None,
+                error: Optional[str] = None, timings: Optional[Dict[str, float]] = None,
+                profile_path: Optional[str] = None):
+        """Записать итог задачи, время стадий и обновить статистику ее класса"""
+        with self._status_lock:
+            info = self._file_statuses.get(job_id)
+            if info is None:
+                return
+            info["status"] = status
+            info["end_time"] = time.time()
+            info["result"] = result
+            info["error"] = error
+            info["profile_path"] = profile_path
+            if timings:
+                frames = int(timings.get("frames") or 1)
+                detections = int(timings.get("detections", 0))
+                info["frames"] = frames
+                info["detections"] = detections
+                info["detections_per_frame"] = detections / frames
+                info["timings"] = {
+                    key: value for key, value in timings.items()
+                    if key not in ("frames", "detections")
+                }
+
+            wait = info["start_time"] - info["added_time"]
+            service = info["end_time"] - info["start_time"]
+            info["wait_time"] = wait
+            info["service_time"] = service
+            stats = self._class_stats[JobClass(info["job_class"])]
+            stats["completed" if status == FileStatus.COMPLETED else "errors"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            stats["service_total"] += service
+            stats["service_max"] = max(stats["service_max"], service)
+            self._evict_finished(job_id, info["end_time"])
+
+        JOB_WAIT_SECONDS.observe(wait, job_class=info["job_class"])
+        JOB_SERVICE_SECONDS.observe(service, job_class=info["job_class"])
+        JOBS_TOTAL.inc(job_class=info["job_class"], status=status.value)
+
+    def _worker(self, image_only: bool = False):
         """Рабочий поток для обработки файлов"""
-        while self._running:
-            try:
-                # Получаем файл из очереди с таймаутом
-                filename, options = self._file_queue.get(timeout=1)
-                
+        # Детекторы потока по точности весов и размеру модели,
+        # создаются при первой задаче с такими параметрами
+        detectors: Dict[tuple, MLObjectDetector] = {}
+
+        while True:
+            # Получаем следующую задачу по приоритету
+            with self._queue_cond:
+                job = self._pop_job(image_only)
+                while job is None and self._running:
+                    self._queue_cond.wait(timeout=1)
+                    job = self._pop_job(image_only)
+                if job is None:
+                    return
+                job_id, filename, options, content_hash = job
+
                 # Обновляем статус на "обрабатывается"
-                with self._status_lock:
-                    if filename in self._file_statuses:
-                        self._file_statuses[filename]["status"] = FileStatus.PROCESSING
-                        self._file_statuses[filename]["start_time"] = time.time()
-                
-                try:
-                    # Выполняем обработку файла
-                    result = self.detector.process_file(
-                        filename,
-                        options.object_types,
-                        options.intensity,
-                        options.blur_type,
+                self._file_statuses[job_id]["status"] = FileStatus.PROCESSING
+                self._file_statuses[job_id]["start_time"] = time.time()
+                profile = self.profile or self._file_statuses[job_id]["profile"]
+
+            timings: Dict[str, float] = {}
+            profiler = JobProfiler() if profile else None
+            try:
+                kwargs = dict(self._detector_kwargs)
+                plan = plan_for_request(filename, options, kwargs["face_model_path"])
+                model_size = plan.model_size if plan else None
+                precision = options.precision or self.precision
+                detector = detectors.get((precision, model_size))
+                if detector is None:
+                    kwargs["face_model_path"], kwargs["general_model_path"] = (
+                        model_paths_for_size(
+                            kwargs["face_model_path"], kwargs["general_model_path"], model_size
+                        )
                     )
-                    result = result.replace('\\', '/')
-                    # Обновляем статус на "завершено"
-                    with self._status_lock:
-                        if filename in self._file_statuses:
-                            self._file_statuses[filename]["status"] = FileStatus.COMPLETED
-                            self._file_statuses[filename]["end_time"] = time.time()
-                            self._file_statuses[filename]["result"] = result
-                            
-                except Exception as e:
-                    # Обновляем статус на "ошибка"
-                    with self._status_lock:
-                        if filename in self._file_statuses:
-                            self._file_statuses[filename]["status"] = FileStatus.ERROR
-                            self._file_statuses[filename]["end_time"] = time.time()
-                            self._file_statuses[filename]["error"] = str(e)
-                
-                # Отмечаем задачу как выполненную
-                self._file_queue.task_done()
-                
-            except queue.Empty:
-                # Таймаут при получении из очереди - продолжаем
-                continue
+                    detector = MLObjectDetector(precision=precision, **kwargs)
+                    detector.initialize()
+                    detectors[(precision, model_size)] = detector
+
+                # Выполняем обработку файла, при профилировании - под cProfile
+                process_file = (
+                    detector.process_file if profiler is None
+                    else partial(profiler.run, detector.process_file)
+                )
+                result = process_file(
+                    filename,
+                    options.object_types,
+                    options.intensity,
+                    options.blur_type,
+                    keyframe_interval=options.keyframe_interval,
+                    track_padding=options.track_padding,
+                    timings=timings,
+                    progress_callback=lambda done, total, job_id=job_id:
+                        self._update_progress(job_id, done, total),
+                    content_hash=content_hash,
+                    plan=plan,
+                    blur_mode=options.blur_mode,
+                )
+                result = result.replace('\\', '/')
+                profile_path = self._save_profile(profiler, job_id)
+                # Обновляем статус на "завершено"
+                self._finish(job_id, FileStatus.COMPLETED, result=result,
+                             timings=timings, profile_path=profile_path)
+
             except Exception as e:
-                # Неожиданная ошибка в рабочем потоке
-                print(f"Ошибка в рабочем потоке: {e}")
+                # Профиль сохраняется и для неудачной обработки
+                profile_path = None
+                try:
+                    profile_path = self._save_profile(profiler, job_id)
+                except OSError:
+                    pass
+                # Обновляем статус на "ошибка"
+                self._finish(job_id, FileStatus.ERROR, error=str(e),
+                             timings=timings, profile_path=profile_path)
+
+    def _save_profile(self, profiler: Optional[JobProfiler], job_id: str) -> Optional[str]:
+        """Сохранение профиля задачи в profile_dir, возвращает путь к .prof"""
+        if profiler is None:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        return profiler.save(os.path.join(self.profile_dir, job_id)).replace('\\', '/')
+
+_processor: Optional[MLExecutor] = None
+_processor_lock = threading.Lock()
 
-processor = MLExecutor()
-processor.start()
+def get_ml_executor() -> MLExecutor:
+    """Общий обработчик очереди, создается и запускается при первом обращении"""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            from app.config import settings
 
-def get_ml_executor():
-    return processor
+            _processor = MLExecutor(
+                workers=settings.job_workers,
+                image_lane_workers=settings.image_lane_workers,
+                aging_rate=settings.job_aging_rate,
+                result_cache=get_result_cache(),
+                detection_cache=get_detection_cache(),
+                backend=settings.model_backend,
+                precision=settings.model_precision,
+                calibration_dir=settings.quantization_calibration_dir,
+                micro_batcher=get_micro_batcher(),
+                profile=settings.profile_jobs,
+                profile_dir=settings.profile_dir,
+                passthrough=settings.no_detection_passthrough,
+                segment_workers=settings.segment_workers,
+                min_segment_frames=settings.min_segment_frames,
+                history_ttl=settings.job_history_ttl,
+                history_max=settings.job_history_max,
+            )
+            _processor.start()
+    return _processor
 
 # Пример использования
 if __name__ == "__main__":
@@ -182,32 +536,38 @@ if __name__ == "__main__":
     # Создаем процессор
     processor = MLExecutor()
     processor.start()
-    
+
     # Добавляем файлы в очередь
     files = ["image.jpg", "video.mp4"]
+    jobs = []
     for file in files:
         options = Options(blur_type="gaussian", intensity=5, object_types=[])
-        success = processor.add_to_queue(file, options)
-        print(f"Файл {file} {'добавлен' if success else 'уже в обработке'}")
-    
+        job_id = processor.add_to_queue(file, options)
+        jobs.append(job_id)
+        print(f"Файл {file} добавлен, задача {job_id}")
+
     # Проверяем статусы
     time.sleep(1)
-    for file in files:
-        status = processor.get_status(file)
+    for job_id in jobs:
+        status = processor.get_status(job_id)
         if status:
-            print(f"Статус {file}: {status['status']}")
-    
+            print(f"Статус {status['filename']}: {status['status']}")
+
     # Ждем завершения обработки
     time.sleep(10)
-    
+
     # Проверяем финальные статусы
     print("\nФинальные статусы:")
     all_statuses = processor.get_all_statuses()
-    for filename, info in all_statuses.items():
-        print(f"{filename}: {info['status']}")
+    for job_id, info in all_statuses.items():
+        print(f"{info['filename']}: {info['status']}")
         if info['result']:
             print(f"  Результат: {info['result']}")
         if info['error']:
             print(f"  Ошибка: {info['error']}")
-    
+
+    print("\nСтатистика очередей:")
+    for job_class, stats in processor.get_queue_stats().items():
+        print(f"{job_class}: {stats}")
+
     processor.stop()
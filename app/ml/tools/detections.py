@@ -0,0 +1,102 @@
+from typing import Iterator, List, Optional, Union
+
+import numpy as np
+
+
+class Detections:
+    """Боксы одного изображения в виде массивов NumPy.
+
+    Координаты, уверенность и классы хранятся целыми массивами, поэтому
+    фильтрация и размытие не создают объект Python на каждый бокс.
+    Для совместимости объект ведет себя как список словарей
+    {'coordinates', 'confidence', 'class_id', 'class_name'}: итерация,
+    len() и индекс по номеру возвращают словари.
+    """
+
+    __slots__ = ("xyxy", "conf", "cls", "names")
+
+    def __init__(
+        self,
+        xyxy: Optional[np.ndarray] = None,
+        conf: Optional[np.ndarray] = None,
+        cls: Optional[np.ndarray] = None,
+        names: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            xyxy: Координаты [x_min, y_min, x_max, y_max], массив (N, 4)
+            conf: Уверенность детекций, массив (N,)
+            cls: Идентификаторы классов в своей модели, массив (N,)
+            names: Имена классов, массив строк (N,)
+        """
+        if xyxy is None:
+            xyxy = np.empty((0, 4), dtype=np.int32)
+        self.xyxy = np.asarray(xyxy, dtype=np.int32).reshape(-1, 4)
+        count = len(self.xyxy)
+        self.conf = np.zeros(count, np.float32) if conf is None else np.asarray(conf, np.float32)
+        self.cls = np.zeros(count, np.int32) if cls is None else np.asarray(cls, np.int32)
+        self.names = np.full(count, "", dtype=object) if names is None else np.asarray(names, object)
+
+    @classmethod
+    def from_dicts(cls, boxes_info: Union["Detections", List[dict]]) -> "Detections":
+        """Перевод списка словарей боксов в массивы"""
+        if isinstance(boxes_info, Detections):
+            return boxes_info
+        return cls(
+            [box["coordinates"] for box in boxes_info],
+            [box["confidence"] for box in boxes_info],
+            [box["class_id"] for box in boxes_info],
+            [box["class_name"] for box in boxes_info],
+        )
+
+    @classmethod
+    def concat(cls, items: List["Detections"]) -> "Detections":
+        """Объединение боксов нескольких моделей для одного изображения"""
+        items = [item for item in items if len(item)]
+        if not items:
+            return cls()
+        if len(items) == 1:
+            return items[0]
+        return cls(
+            np.concatenate([item.xyxy for item in items]),
+            np.concatenate([item.conf for item in items]),
+            np.concatenate([item.cls for item in items]),
+            np.concatenate([item.names for item in items]),
+        )
+
+    def select(self, mask: np.ndarray) -> "Detections":
+        """Боксы, отобранные булевой маской или массивом индексов"""
+        return Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names[mask])
+
+    @property
+    def area(self) -> np.ndarray:
+        """Площадь каждого бокса"""
+        return (self.xyxy[:, 2] - self.xyxy[:, 0]) * (self.xyxy[:, 3] - self.xyxy[:, 1])
+
+    def to_dicts(self) -> List[dict]:
+        """Боксы в виде списка словарей"""
+        return [
+            {
+                "coordinates": coords,
+                "confidence": round(conf, 3),
+                "class_id": class_id,
+                "class_name": name,
+            }
+            for coords, conf, class_id, name in zip(
+                self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist(), self.names.tolist()
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.to_dicts())
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return self.to_dicts()[index]
+        return self.select([index]).to_dicts()[0]
+
+    def __repr__(self) -> str:
+        return f"Detections({len(self)} boxes)"
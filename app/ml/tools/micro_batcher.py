@@ -0,0 +1,131 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class _Group:
+    """Изображения, собираемые в один батч, и результат его обработки"""
+
+    def __init__(self, run_batch: Callable[[List[np.ndarray]], List]):
+        self.run_batch = run_batch
+        self.images: List[np.ndarray] = []
+        self.closed = False
+        self.done = threading.Event()
+        self.results: Optional[List] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Объединение одиночных изображений параллельных запросов в общий батч
+
+    Первый поток, пришедший с изображением для данного ключа, становится
+    ведущим: он ждет до max_wait_ms (или пока не наберется max_batch
+    изображений), затем одним вызовом run_batch обрабатывает всю группу
+    и раздает результаты остальным потокам. Отдельного потока у батчера
+    нет, поэтому одиночный запрос теряет не больше max_wait_ms.
+    """
+
+    def __init__(self, max_batch: int = 8, max_wait_ms: float = 10.0):
+        """
+        Args:
+            max_batch: Наибольшее число изображений в батче
+            max_wait_ms: Сколько ведущий поток ждет остальные изображения
+        """
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._groups: Dict[Hashable, _Group] = {}
+        self._cond = threading.Condition()
+        self._batches = 0
+        self._images = 0
+
+    def run(
+        self,
+        key: Hashable,
+        image: np.ndarray,
+        run_batch: Callable[[List[np.ndarray]], List],
+    ):
+        """
+        Обработка изображения в составе батча
+
+        Args:
+            key: Ключ группы: в один батч попадают только изображения с
+                одинаковым ключом (модели, классы, размер входа)
+            image: Изображение
+            run_batch: Обработка списка изображений, возвращает результаты
+                в том же порядке (вызывается ведущим потоком группы)
+
+        Returns:
+            Результат run_batch для этого изображения
+        """
+        with self._cond:
+            group = self._groups.get(key)
+            leader = group is None
+            if leader:
+                group = self._groups[key] = _Group(run_batch)
+            index = len(group.images)
+            group.images.append(image)
+            if len(group.images) >= self.max_batch:
+                self._close(key, group)
+
+            if leader:
+                deadline = time.monotonic() + self.max_wait
+                while not group.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._close(key, group)
+                        break
+                    self._cond.wait(remaining)
+                self._batches += 1
+                self._images += len(group.images)
+
+        if leader:
+            try:
+                group.results = group.run_batch(group.images)
+            except BaseException as e:
+                group.error = e
+            finally:
+                group.done.set()
+        else:
+            group.done.wait()
+
+        if group.error is not None:
+            raise group.error
+        return group.results[index]
+
+    def _close(self, key: Hashable, group: _Group) -> None:
+        """Закрытие группы для новых изображений (под self._cond)"""
+        group.closed = True
+        if self._groups.get(key) is group:
+            del self._groups[key]
+        self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """Число батчей, изображений и средний размер батча"""
+        with self._cond:
+            return {
+                "batches": self._batches,
+                "images": self._images,
+                "avg_batch_size": self._images / self._batches if self._batches else 0.0,
+            }
+
+
+_micro_batcher: Optional[MicroBatcher] = None
+_micro_batcher_lock = threading.Lock()
+
+
+def get_micro_batcher() -> Optional[MicroBatcher]:
+    """Общий батчер процесса, None если он отключен в настройках"""
+    global _micro_batcher
+    from app.config import settings
+
+    if settings.micro_batch_size <= 1:
+        return None
+    with _micro_batcher_lock:
+        if _micro_batcher is None:
+            _micro_batcher = MicroBatcher(
+                settings.micro_batch_size, settings.micro_batch_wait_ms
+            )
+    return _micro_batcher
@@ -1,51 +1,297 @@
 import os
+import shutil
+import tempfile
+import threading
+import time
 
+import numpy as np
 from ultralytics import YOLO
-from typing import List
+from typing import List, Optional
+
+from app.ml.tools.detections import Detections
+
+# Бэкенды инференса: torch - исходные веса .pt, остальные - экспорт ultralytics
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Точность весов, доступная в каждом бэкенде: fp16 - экспорт OpenVINO
+# с половинной точностью, int8 - квантование ONNX Runtime
+BACKEND_PRECISIONS = {
+    "torch": ("fp32",),
+    "onnx": ("fp32", "int8-dynamic", "int8-static"),
+    "openvino": ("fp32", "fp16"),
+}
+PRECISIONS = ("fp32", "fp16", "int8-dynamic", "int8-static")
+
+# Экспорт одной модели несколькими потоками одновременно не нужен
+_export_lock = threading.RLock()
+
+
+def resolve_backend(backend: str, precision: str) -> str:
+    """
+    Бэкенд, в котором доступна нужная точность
+
+    Если выбранный бэкенд не поддерживает точность (например, int8 при
+    бэкенде torch), используется первый бэкенд, который ее поддерживает.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Неизвестная точность: {precision}. Доступны: {', '.join(PRECISIONS)}")
+    if precision in BACKEND_PRECISIONS.get(backend, ()):
+        return backend
+    return next(name for name in BACKENDS if precision in BACKEND_PRECISIONS[name])
+
 
 class Model:
     """Модуль для работы с YOLO моделью и обработки результатов детекции"""
     
-    def __init__(self, model_path: str = "models/yolov11m-face.pt", confidence_threshold: float = 0.7):
+    def __init__(
+        self,
+        model_path: str = "models/yolov11m-face.pt",
+        confidence_threshold: float = 0.7,
+        backend: str = "torch",
+        precision: str = "fp32",
+        calibration_dir: Optional[str] = None,
+    ):
         """
         Инициализация модуля
         
         Args:
             model_path: Путь к файлу весов модели (.pt)
             confidence_threshold: Порог уверенности для фильтрации детекций
+            backend: Бэкенд инференса: "torch", "onnx" (ONNX Runtime)
+                или "openvino". Для onnx и openvino веса один раз
+                экспортируются рядом с .pt и затем переиспользуются
+            precision: Точность весов: "fp32", "fp16" (openvino),
+                "int8-dynamic" или "int8-static" (onnx)
+            calibration_dir: Каталог изображений для калибровки int8-static
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {backend}. Доступны: {', '.join(BACKENDS)}")
+        if precision not in BACKEND_PRECISIONS[backend]:
+            raise ValueError(f"Бэкенд {backend} не поддерживает точность {precision}")
         self.model_path = model_path
         self.confidence_threshold = confidence_threshold
+        self.backend = backend
+        self.precision = precision
+        self.calibration_dir = calibration_dir
         self.model = None
         self.class_names = None
+        # Имена классов по идентификатору для перевода массива классов в имена
+        self._name_lookup = None
+        # Модель может быть общей для нескольких детекторов и потоков
+        # (ModelRegistry): загрузка и вызовы предсказателя YOLO под блокировкой
+        self._lock = threading.RLock()
+        self.load_seconds: Optional[float] = None
+        self.calls = 0
+        self.last_used: Optional[float] = None
         
+    @property
+    def version(self) -> str:
+        """Идентификатор версии весов: имя, размер и время изменения файла"""
+        try:
+            stat = os.stat(self.model_path)
+        except OSError:
+            return os.path.basename(self.model_path)
+        version = f"{os.path.basename(self.model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        # Экспортированная модель может давать немного другие боксы
+        if self.backend != "torch":
+            version += f":{self.backend}"
+        if self.precision != "fp32":
+            version += f":{self.precision}"
+        return version
+
+    @property
+    def export_path(self) -> Optional[str]:
+        """Путь к экспортированной модели (None для бэкенда torch)"""
+        stem = os.path.splitext(self.model_path)[0]
+        if self.precision != "fp32":
+            stem += "_" + self.precision.replace("-", "_")
+        if self.backend == "onnx":
+            return f"{stem}.onnx"
+        if self.backend == "openvino":
+            return f"{stem}_openvino_model"
+        return None
+
+    def _export_is_fresh(self) -> bool:
+        """Экспорт существует и не старше исходных весов"""
+        path = self.export_path
+        if not os.path.exists(path):
+            return False
+        return os.path.getmtime(path) >= os.path.getmtime(self.model_path)
+
+    def export(self) -> str:
+        """
+        Экспорт весов в формат бэкенда, если готового экспорта нет
+
+        Экспорт выполняется ultralytics с динамическими размерами входа,
+        чтобы работали батчи и любые размеры кадров. INT8 получается
+        квантованием экспорта ONNX FP32. Результат кладется рядом
+        с весами (models/) и используется при следующих запусках.
+
+        Returns:
+            Путь к модели для загрузки
+        """
+        if self.backend == "torch":
+            return self.model_path
+
+        with _export_lock:
+            if not self._export_is_fresh():
+                print(f"Экспорт {self.model_path} в формат {self.backend} ({self.precision})...")
+                if self.precision.startswith("int8"):
+                    from app.ml.tools.quantization import quantize_onnx
+
+                    source = Model(self.model_path, backend="onnx").export()
+                    self._replace_export(
+                        lambda tmp: quantize_onnx(
+                            source,
+                            os.path.join(tmp, os.path.basename(self.export_path)),
+                            self.precision.split("-")[1],
+                            self.calibration_dir,
+                        )
+                    )
+                else:
+                    self._replace_export(self._export_ultralytics)
+        return self.export_path
+
+    def _export_ultralytics(self, tmp_dir: str) -> str:
+        """Экспорт копии весов во временном каталоге, возвращает путь результата"""
+        weights = shutil.copy(self.model_path, tmp_dir)
+        return YOLO(weights, verbose=False).export(
+            format=self.backend, dynamic=True, half=self.precision == "fp16", verbose=False
+        )
+
+    def _replace_export(self, build) -> None:
+        """
+        Сборка экспорта во временном каталоге рядом с весами и перенос на
+        место export_path, чтобы другие процессы не увидели его недописанным
+        """
+        target = self.export_path
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(target)))
+        try:
+            built = build(tmp_dir)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(built, target)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
     def load_model(self):
         """Загрузка модели YOLO"""
-        try:
-            os.environ['YOLO_VERBOSE'] = 'False'  # Глобальное отключение вывода
-            self.model = YOLO(self.model_path, verbose=False)
-            self.class_names = self.model.names
-            print(f"Модель успешно загружена из {self.model_path}")
-        except Exception as e:
-            print(f"Ошибка загрузки модели: {e}")
-            raise
+        with self._lock:
+            try:
+                os.environ['YOLO_VERBOSE'] = 'False'  # Глобальное отключение вывода
+                start = time.perf_counter()
+                weights_path = self.export()
+                model = YOLO(weights_path, task="detect", verbose=False)
+                self.class_names = model.names
+                self._name_lookup = np.array(
+                    [self.class_names.get(i, str(i)) for i in range(max(self.class_names) + 1)],
+                    dtype=object,
+                )
+                # Присваивается последним: по self.model судят, что модель готова
+                self.model = model
+                self.load_seconds = time.perf_counter() - start
+                print(f"Модель успешно загружена из {weights_path}")
+            except Exception as e:
+                print(f"Ошибка загрузки модели: {e}")
+                raise
+
+    def ensure_loaded(self) -> None:
+        """Загрузка модели при первом использовании (повторно не загружается)"""
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self.load_model()
+
+    @property
+    def memory_bytes(self) -> Optional[int]:
+        """
+        Оценка памяти загруженной модели: параметры и буферы для torch,
+        размер экспортированной модели для остальных бэкендов
+        """
+        if self.model is None:
+            return None
+        if self.backend == "torch":
+            try:
+                module = self.model.model
+                tensors = list(module.parameters()) + list(module.buffers())
+                return sum(t.numel() * t.element_size() for t in tensors)
+            except Exception:
+                pass
+        path = self.export_path or self.model_path
+        if os.path.isdir(path):
+            return sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(path)
+                for name in names
+            )
+        return os.path.getsize(path) if os.path.exists(path) else None
     
-    def predict(self, image_source) -> List:
+    def predict(
+        self,
+        image_source,
+        classes: Optional[List[int]] = None,
+        imgsz: Optional[int] = None,
+        conf: Optional[float] = None,
+    ) -> List:
         """
         Выполнение предсказания на изображении
         
         Args:
-            image_source: Путь к изображению, numpy array или URL
+            image_source: Путь к изображению, numpy array, URL
+                или список таких источников для батчевого предсказания
+            classes: Идентификаторы классов, которые нужно оставить
+                (None - все классы модели)
+            imgsz: Размер входа модели по длинной стороне
+                (None - размер по умолчанию)
+            conf: Порог уверенности (None - confidence_threshold модели)
             
         Returns:
-            Список результатов детекции
+            Список результатов детекции (по одному на изображение)
         """
-        if self.model is None:
-            raise ValueError("Модель не загружена. Вызовите load_model() сначала")
-            
-        results = self.model(image_source, conf=self.confidence_threshold, verbose=False)
+        self.ensure_loaded()
+
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        with self._lock:
+            results = self.model(
+                image_source,
+                conf=self.confidence_threshold if conf is None else conf,
+                classes=classes,
+                verbose=False,
+                **kwargs
+            )
+            self.calls += 1
+            self.last_used = time.time()
         return results
     
+    def extract_detections(self, result) -> Detections:
+        """
+        Извлечение боксов одного изображения в виде массивов
+
+        Координаты, уверенность и классы забираются из результата целыми
+        тензорами, без обращения к каждому боксу по отдельности.
+
+        Args:
+            result: Результат предсказания модели для одного изображения
+
+        Returns:
+            Боксы изображения
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return Detections()
+
+        cls = boxes.cls.cpu().numpy().astype(np.int32)
+        return Detections(
+            boxes.xyxy.cpu().numpy().astype(np.int32),
+            boxes.conf.cpu().numpy(),
+            cls,
+            self._name_lookup[cls],
+        )
+
+    def extract_detections_per_image(self, results) -> List[Detections]:
+        """Боксы в виде массивов для каждого изображения батча"""
+        return [self.extract_detections(result) for result in results]
+
     def extract_boxes(self, results) -> List[dict]:
         """
         Извлечение информации о боксах из результатов
@@ -59,18 +305,22 @@ class Model:
         boxes_info = []
         
         for result in results:
-            if result.boxes is not None:
-                for box in result.boxes:
-                    # Получаем координаты бокса
-                    coords = box.xyxy[0].tolist()
-                    coords = [int(x) for x in coords]
-                    
-                    box_info = {
-                        'coordinates': coords,  # [x_min, y_min, x_max, y_max]
-                        'confidence': round(box.conf.item(), 3),
-                        'class_id': int(box.cls.item()),
-                        'class_name': self.class_names[int(box.cls.item())]
-                    }
-                    boxes_info.append(box_info)
+            boxes_info.extend(self._extract_result_boxes(result))
         
         return boxes_info
+
+    def extract_boxes_per_image(self, results) -> List[List[dict]]:
+        """
+        Извлечение боксов с разбиением по изображениям батча
+        
+        Args:
+            results: Результаты предсказания модели на батче изображений
+            
+        Returns:
+            Список списков боксов, по одному на каждое изображение батча
+        """
+        return [self._extract_result_boxes(result) for result in results]
+
+    def _extract_result_boxes(self, result) -> List[dict]:
+        """Извлечение боксов из результата для одного изображения"""
+        return self.extract_detections(result).to_dicts()
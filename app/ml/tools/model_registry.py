@@ -0,0 +1,122 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.ml.tools.model import Model
+
+# Порог уверенности моделей реестра для вызовов без conf (прогрев, бенчмарки),
+# тот же, что у детектора по умолчанию
+DEFAULT_CONFIDENCE = 0.5
+
+
+def process_rss() -> Optional[int]:
+    """Резидентная память процесса в байтах (None, если узнать не удалось)"""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Общие для процесса модели
+
+    Каждый файл весов с заданными бэкендом, точностью и каталогом калибровки
+    загружается один раз
+    при первом использовании и разделяется всеми детекторами процесса.
+    Вызовы предсказателя одной модели из разных потоков выполняются по
+    очереди (блокировка внутри Model), порог уверенности передается
+    детектором при каждом вызове, поэтому от него экземпляр не зависит.
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str, str, Optional[str]], Model] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model_path: str,
+        backend: str = "torch",
+        precision: str = "fp32",
+        calibration_dir: Optional[str] = None,
+    ) -> Model:
+        """
+        Общая модель для весов, бэкенда, точности и калибровки (без загрузки)
+
+        Args:
+            model_path: Путь к файлу весов (.pt)
+            backend: Бэкенд инференса
+            precision: Точность весов
+            calibration_dir: Каталог калибровки int8-static
+
+        Returns:
+            Модель, загружаемая при первом предсказании или ensure_loaded()
+        """
+        key = (
+            os.path.abspath(model_path), backend, precision,
+            os.path.abspath(calibration_dir) if calibration_dir else None,
+        )
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = Model(
+                    model_path, DEFAULT_CONFIDENCE, backend=backend, precision=precision,
+                    calibration_dir=calibration_dir,
+                )
+                self._models[key] = model
+        return model
+
+    def models(self) -> List[Model]:
+        """Все модели реестра"""
+        with self._lock:
+            return list(self._models.values())
+
+    def warm_up(self, models: Iterable[Model], imgsz: int = 640) -> None:
+        """Загрузка моделей и пробный прогон, чтобы первый запрос не ждал"""
+        frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for model in models:
+            model.ensure_loaded()
+            model.predict(frame, conf=DEFAULT_CONFIDENCE)
+
+    def memory_report(self) -> dict:
+        """Загруженные модели, оценка их памяти и память процесса"""
+        models = []
+        for model in self.models():
+            models.append({
+                "model_path": model.model_path,
+                "backend": model.backend,
+                "precision": model.precision,
+                "loaded": model.model is not None,
+                "memory_bytes": model.memory_bytes,
+                "load_seconds": model.load_seconds,
+                "calls": model.calls,
+                "last_used": model.last_used,
+            })
+        return {
+            "models": models,
+            "resident_models": sum(1 for m in models if m["loaded"]),
+            "models_bytes": sum(m["memory_bytes"] or 0 for m in models),
+            "process_rss_bytes": process_rss(),
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Общий реестр моделей процесса"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+    return _registry
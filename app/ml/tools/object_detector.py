@@ -1,12 +1,41 @@
 import os
-from typing import List, Optional, Tuple, Union
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 from moviepy.editor import VideoFileClip
 
-from app.ml.tools.model import Model
-from app.ml.tools.write_box import BoxProcessor
+from app.ml.tools.detections import Detections
+from app.ml.tools.micro_batcher import MicroBatcher
+from app.ml.tools.model import Model, resolve_backend
+from app.ml.tools.model_registry import get_model_registry
+from app.ml.tools.resolution import ResolutionPlan, tile_grid
+from app.ml.tools.tracker import BoxTracker
+from app.ml.tools.video_pipeline import VideoPipeline
+from app.ml.tools.video_writer import FFmpegWriter, find_ffmpeg
+from app.ml.tools.write_box import BoxProcessor, Boxes
+from app.tools.detection_cache import DetectionCache
+from app.tools.generate_name_file import file_content_hash
+from app.tools.metrics import (
+    BOX_EXTRACTION_SECONDS,
+    FILES_TOTAL,
+    FRAMES_TOTAL,
+    MODEL_INFERENCE_SECONDS,
+    STAGE_SECONDS,
+)
+from app.tools.result_cache import ResultCache, link_or_copy
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv"}
+
+FACE_MODEL_PATH = "models/yolov11m-face.pt"
+GENERAL_MODEL_PATH = "models/yolo11m.pt"
+
+# Стадии обработки файла, попадающие в метрику faceoff_stage_seconds
+STAGES = ("decode", "inference", "blur", "encode", "audio_mux")
 
 
 class MLObjectDetector:
@@ -14,18 +43,156 @@ class MLObjectDetector:
 
     def __init__(
         self,
-        face_model_path: str = "models/yolov11m-face.pt",
-        general_model_path: str = "models/yolo11m.pt",
+        face_model_path: str = FACE_MODEL_PATH,
+        general_model_path: str = GENERAL_MODEL_PATH,
         confidence_threshold: float = 0.5,
+        batch_size: int = 8,
+        pipelined: bool = True,
+        queue_size: int = 2,
+        encoder: str = "ffmpeg",
+        segment_workers: int = 1,
+        min_segment_frames: int = 900,
+        result_cache: Optional[ResultCache] = None,
+        detection_cache: Optional[DetectionCache] = None,
+        backend: str = "torch",
+        precision: str = "fp32",
+        calibration_dir: Optional[str] = None,
+        micro_batcher: Optional[MicroBatcher] = None,
+        passthrough: bool = True,
     ) -> None:
-        self.face_model = Model(face_model_path, confidence_threshold)
-        self.general_model = Model(general_model_path, confidence_threshold)
+        # backend: "torch", "onnx" или "openvino" (экспорт весов для CPU);
+        # precision: "fp32", "fp16" или "int8-dynamic"/"int8-static". Если
+        # бэкенд не поддерживает точность, берется бэкенд, который поддерживает
+        backend = resolve_backend(backend, precision)
+        self.precision = precision
+        # Веса общие для всех детекторов процесса и загружаются при первом
+        # использовании, порог уверенности передается при каждом вызове
+        registry = get_model_registry()
+        self.face_model = registry.get(face_model_path, backend, precision, calibration_dir)
+        self.general_model = registry.get(general_model_path, backend, precision, calibration_dir)
         self.box_processor = BoxProcessor()
+        self.confidence_threshold = confidence_threshold
+        # Кэш готовых результатов по содержимому файла и параметрам обработки
+        self.result_cache = result_cache
+        # Кэш боксов по кадрам: повторное размытие того же файла без инференса
+        self.detection_cache = detection_cache
+        # Общий батчер: одиночные изображения параллельных запросов
+        # обрабатываются моделями одним батчем
+        self.micro_batcher = micro_batcher
+        # Количество кадров видео, передаваемых в модели за один вызов
+        self.batch_size = max(1, batch_size)
+        # Параллельные стадии обработки видео и размер очередей между ними (в батчах)
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        # "ffmpeg" - один проход libx264 с копированием аудио,
+        # "opencv" - запись mp4v и перекодирование с аудио через moviepy
+        self.encoder = encoder
+        # Сегментный режим: длинное видео делится на отрезки не короче
+        # min_segment_frames, которые обрабатываются в segment_workers процессах
+        self.segment_workers = max(1, segment_workers)
+        self.min_segment_frames = min_segment_frames
+        # Файл, про который известно, что детекций в нем нет (изображение после
+        # детекции, видео по кэшу детекций), отдается жесткой ссылкой на исходный
+        self.passthrough = passthrough
+        self._segmented = None
+        # Параметры для создания детекторов в процессах-воркерах
+        self._worker_kwargs = dict(
+            face_model_path=face_model_path,
+            general_model_path=general_model_path,
+            confidence_threshold=confidence_threshold,
+            batch_size=batch_size,
+            pipelined=pipelined,
+            queue_size=queue_size,
+            backend=backend,
+            precision=precision,
+            calibration_dir=calibration_dir,
+        )
+        # Счетчики вызовов моделей и пропущенных вызовов (по пути к весам)
+        self._model_calls: Counter = Counter()
+        self._skipped_model_calls: Counter = Counter()
+        # Площадь боксов и фактически размытая площадь после объединения боксов
+        self._blur_pixels: Counter = Counter()
+        # Суммарное время вызовов моделей и извлечения боксов (секунды)
+        self._model_seconds: Counter = Counter()
+        self._stats_lock = threading.Lock()
 
     def initialize(self) -> None:
-        """Загрузка моделей."""
-        self.face_model.load_model()
-        self.general_model.load_model()
+        """Загрузка моделей, если они еще не загружены в процессе."""
+        for model in self.models:
+            model.ensure_loaded()
+
+    @property
+    def models(self) -> List[Model]:
+        """Все модели детектора в порядке запуска."""
+        return [self.face_model, self.general_model]
+
+    def get_model_call_stats(self) -> Dict[str, Dict[str, int]]:
+        """Количество выполненных и пропущенных вызовов каждой модели."""
+        with self._stats_lock:
+            return {
+                "calls": dict(self._model_calls),
+                "skipped": dict(self._skipped_model_calls),
+            }
+
+    def get_blur_stats(self) -> Dict[str, int]:
+        """Площадь боксов, размытая площадь и сэкономленные объединением пиксели."""
+        with self._stats_lock:
+            box_pixels = self._blur_pixels["box_pixels"]
+            blurred_pixels = self._blur_pixels["blurred_pixels"]
+        return {
+            "box_pixels": box_pixels,
+            "blurred_pixels": blurred_pixels,
+            "saved_pixels": box_pixels - blurred_pixels,
+        }
+
+    def _draw_boxes(
+        self,
+        image: np.ndarray,
+        boxes_info: Boxes,
+        intensity: int,
+        blur_type: str,
+        inplace: bool = False,
+        blur_mode: str = "box",
+    ) -> np.ndarray:
+        """Размытие боксов (box) или вписанных в них эллипсов (mask)
+        с учетом статистики сэкономленных пикселей."""
+        stats: Dict[str, int] = {}
+        draw = self.box_processor.draw_mask if blur_mode == "mask" else self.box_processor.draw_boxes
+        result_image = draw(
+            image, boxes_info, intensity, blur_type, inplace=inplace, stats=stats
+        )
+        with self._stats_lock:
+            self._blur_pixels.update(stats)
+        return result_image
+
+    def _route_models(
+        self, object_types: List[str]
+    ) -> List[Tuple[Model, Optional[List[int]]]]:
+        """Выбор моделей, способных найти запрошенные классы.
+
+        Пустой object_types означает режим "все классы": запускаются все
+        модели без ограничения по классам. Иначе для каждой модели
+        вычисляются идентификаторы запрошенных классов, а модели без
+        подходящих классов пропускаются.
+        """
+        routed = []
+        requested = set(object_types)
+        for model in self.models:
+            model.ensure_loaded()
+            if not requested:
+                routed.append((model, None))
+                continue
+            class_ids = [
+                class_id
+                for class_id, name in model.class_names.items()
+                if name in requested
+            ]
+            if class_ids:
+                routed.append((model, class_ids))
+            else:
+                with self._stats_lock:
+                    self._skipped_model_calls[model.model_path] += 1
+        return routed
 
     def _get_output_filename(self, input_path: str) -> str:
         """Возвращает путь для сохранения результата с суффиксом _processed."""
@@ -36,25 +203,101 @@ class MLObjectDetector:
         return os.path.join(dir_name, output_name)
 
     def _run_models(
-        self, image_source: Union[str, np.ndarray], object_types: List[str]
-    ) -> List[dict]:
-        boxes: List[dict] = []
-        run_face = "face" in object_types
-        run_general = set(object_types)|set(self.general_model.class_names.values())
+        self,
+        image_source: Union[str, np.ndarray],
+        object_types: List[str],
+        imgsz: Optional[int] = None,
+    ) -> Detections:
+        return self._run_models_batch([image_source], object_types, imgsz)[0]
+
+    def _run_models_batch(
+        self,
+        images: List[Union[str, np.ndarray]],
+        object_types: List[str],
+        imgsz: Optional[int] = None,
+    ) -> List[Detections]:
+        """Запуск моделей на батче изображений, боксы возвращаются по кадрам."""
+        found: List[List[Detections]] = [[] for _ in images]
 
-        if run_face:
-            results = self.face_model.predict(image_source)
-            boxes.extend(self.face_model.extract_boxes(results))
+        for model, class_ids in self._route_models(object_types):
+            role = "face" if model is self.face_model else "general"
+            start = time.perf_counter()
+            results = model.predict(
+                images, classes=class_ids, imgsz=imgsz, conf=self.confidence_threshold
+            )
+            inference = time.perf_counter() - start
+            start = time.perf_counter()
+            per_image = model.extract_detections_per_image(results)
+            extraction = time.perf_counter() - start
 
-        if len(run_general)!=0:
-            results = self.general_model.predict(image_source)
-            boxes.extend(self.general_model.extract_boxes(results))
+            MODEL_INFERENCE_SECONDS.observe(inference, model=role)
+            BOX_EXTRACTION_SECONDS.observe(extraction, model=role)
+            with self._stats_lock:
+                self._model_calls[model.model_path] += 1
+                self._model_seconds[f"inference_{role}"] += inference
+                self._model_seconds["box_extraction"] += extraction
+            for frame_found, detections in zip(found, per_image):
+                frame_found.append(detections)
 
+        boxes = [Detections.concat(frame_found) for frame_found in found]
         if object_types:
-            boxes = [b for b in boxes if b["class_name"] in object_types]
+            boxes = [
+                detections.select(np.isin(detections.names, object_types))
+                for detections in boxes
+            ]
 
         return boxes
 
+    def _run_models_tiled(
+        self,
+        image: np.ndarray,
+        object_types: List[str],
+        plan: ResolutionPlan,
+        nms_threshold: float = 0.5,
+    ) -> Detections:
+        """Детекция на большом изображении по плиткам.
+
+        Плитки с перекрытием обрабатываются одним батчем вместе с уменьшенным
+        изображением целиком (для крупных лиц, не помещающихся в плитку),
+        боксы переводятся в координаты изображения и объединяются NMS.
+        """
+        height, width = image.shape[:2]
+        tiles = tile_grid(width, height, plan.tile_size, plan.tile_overlap)
+        crops = [image[y_min:y_max, x_min:x_max] for x_min, y_min, x_max, y_max in tiles]
+        found = self._run_models_batch([image] + crops, object_types, plan.imgsz)
+
+        shifted = [found[0]]
+        for (x_min, y_min, _, _), detections in zip(tiles, found[1:]):
+            offset = np.array([x_min, y_min, x_min, y_min])
+            shifted.append(Detections(
+                detections.xyxy + offset, detections.conf, detections.cls, detections.names
+            ))
+        merged = Detections.concat(shifted)
+        if len(merged) < 2:
+            return merged
+
+        _, class_index = np.unique(merged.names.astype(str), return_inverse=True)
+        xywh = merged.xyxy.copy()
+        xywh[:, 2:] -= xywh[:, :2]
+        keep = cv2.dnn.NMSBoxesBatched(
+            xywh.tolist(), merged.conf.tolist(), class_index.tolist(), 0.0, nms_threshold
+        )
+        return merged.select(np.asarray(keep, dtype=np.int64).reshape(-1))
+
+    def _filter_boxes(
+        self,
+        boxes_info: Detections,
+        min_area: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+    ) -> Detections:
+        if min_area is not None:
+            boxes_info = self.box_processor.filter_boxes_by_area(boxes_info, min_area)
+        if min_confidence is not None:
+            boxes_info = self.box_processor.filter_boxes_by_confidence(
+                boxes_info, min_confidence
+            )
+        return boxes_info
+
     def detect_objects(
         self,
         image_source: Union[str, np.ndarray],
@@ -63,79 +306,469 @@ class MLObjectDetector:
         blur_type: str,
         min_area: Optional[int] = None,
         min_confidence: Optional[float] = None,
-    ) -> Tuple[List[dict], np.ndarray]:
-        """Полный цикл детекции объектов для изображений."""
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Tuple[Detections, np.ndarray]:
+        """Полный цикл детекции объектов для изображений.
+
+        Боксы возвращаются в виде Detections, список словарей - to_dicts().
+        plan задает размер входа моделей и режим плиток, blur_mode - форму
+        размытия: "box" (прямоугольники) или "mask" (эллипсы по маске).
+        В timings записывается время стадий decode, inference и blur.
+        """
+        timings = {} if timings is None else timings
 
+        t = time.perf_counter()
         if isinstance(image_source, str):
             image = cv2.imread(image_source)
         else:
             image = image_source
+        timings["decode"] = time.perf_counter() - t
 
-        boxes_info = self._run_models(image_source, object_types)
+        t = time.perf_counter()
 
-        if min_area is not None:
-            boxes_info = self.box_processor.filter_boxes_by_area(boxes_info, min_area)
-        if min_confidence is not None:
-            boxes_info = self.box_processor.filter_boxes_by_confidence(
-                boxes_info, min_confidence
+        if plan is not None and plan.tile_size:
+            boxes_info = self._run_models_tiled(image, object_types, plan)
+        elif self.micro_batcher is not None:
+            imgsz = plan.imgsz if plan is not None else None
+            boxes_info = self.micro_batcher.run(
+                self._micro_batch_key(object_types, imgsz),
+                image,
+                lambda images: self._run_models_batch(images, object_types, imgsz),
             )
+        else:
+            imgsz = plan.imgsz if plan is not None else None
+            boxes_info = self._run_models(image_source, object_types, imgsz)
+        boxes_info = self._filter_boxes(boxes_info, min_area, min_confidence)
+        timings["inference"] = time.perf_counter() - t
 
-        result_image = self.box_processor.draw_boxes(
-            image, boxes_info, intensity, blur_type
+        # Изображение, прочитанное здесь же, можно размывать без копии
+        t = time.perf_counter()
+        result_image = self._draw_boxes(
+            image, boxes_info, intensity, blur_type,
+            inplace=isinstance(image_source, str), blur_mode=blur_mode,
         )
+        timings["blur"] = time.perf_counter() - t
         return boxes_info, result_image
 
+    def _micro_batch_key(self, object_types: List[str], imgsz: Optional[int]) -> tuple:
+        """Изображения с одинаковым ключом можно обработать одним батчем."""
+        return (
+            tuple(id(model) for model in self.models),
+            self.confidence_threshold,
+            tuple(sorted(object_types)),
+            imgsz,
+        )
+
+    def detect_objects_batch(
+        self,
+        frames: List[np.ndarray],
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        min_area: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+        blur_mode: str = "box",
+    ) -> List[Tuple[Detections, np.ndarray]]:
+        """Полный цикл детекции для батча кадров с сохранением их порядка."""
+        batch_boxes = self._run_models_batch(frames, object_types)
+
+        results = []
+        for frame, boxes_info in zip(frames, batch_boxes):
+            boxes_info = self._filter_boxes(boxes_info, min_area, min_confidence)
+            result_image = self._draw_boxes(
+                frame, boxes_info, intensity, blur_type, blur_mode=blur_mode
+            )
+            results.append((boxes_info, result_image))
+        return results
+
+    def _detect_video_batch(
+        self,
+        frames: List[np.ndarray],
+        start_index: int,
+        object_types: List[str],
+        keyframe_interval: int,
+        tracker: Optional[BoxTracker],
+        imgsz: Optional[int] = None,
+    ) -> List[Boxes]:
+        """Боксы для батча кадров видео.
+
+        Без трекера детекция выполняется на всех кадрах батча. С трекером
+        модели запускаются одним батчем только на ключевых кадрах (каждый
+        keyframe_interval-й кадр видео), остальные кадры получают боксы
+        трекингом, а при смене сцены детекция выполняется внепланово.
+        """
+        if tracker is None:
+            return self._run_models_batch(frames, object_types, imgsz)
+
+        key_positions = [
+            i for i in range(len(frames))
+            if (start_index + i) % keyframe_interval == 0
+        ]
+        detected = {}
+        if key_positions:
+            key_boxes = self._run_models_batch(
+                [frames[i] for i in key_positions], object_types, imgsz
+            )
+            detected = dict(zip(key_positions, key_boxes))
+
+        batch_boxes = []
+        for i, frame in enumerate(frames):
+            if i in detected:
+                boxes_info = detected[i]
+            elif tracker.is_scene_change(frame):
+                boxes_info = self._run_models(frame, object_types, imgsz)
+            else:
+                batch_boxes.append(tracker.track(frame))
+                continue
+            tracker.reset(frame, boxes_info)
+            batch_boxes.append(boxes_info)
+        return batch_boxes
+
+    @staticmethod
+    def _read_batches(
+        cap: cv2.VideoCapture, batch_size: int, max_frames: Optional[int] = None
+    ) -> Iterator[List[np.ndarray]]:
+        """Чтение кадров видео пачками по batch_size штук (не более max_frames)."""
+        frames: List[np.ndarray] = []
+        read = 0
+        while max_frames is None or read < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+            read += 1
+            if len(frames) == batch_size:
+                yield frames
+                frames = []
+        if frames:
+            yield frames
+
     def process_image(
         self,
         image_path: str,
         object_types: List[str],
         intensity: int,
         blur_type: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+        timings: Optional[Dict[str, float]] = None,
     ) -> str:
-        boxes_info, result_image = self.detect_objects(
-            image_path, object_types, intensity, blur_type
-        )
+        """Обработка изображения.
+
+        replay_boxes - сохраненные ранее боксы (список из одного элемента),
+        с ними инференс пропускается. В record_boxes добавляются найденные боксы.
+        plan задает размер входа моделей и режим плиток для больших изображений.
+        В timings записывается время стадий decode, inference, blur, encode
+        и число боксов detections.
+        """
+        timings = {} if timings is None else timings
         output_path = self._get_output_filename(image_path)
-        cv2.imwrite(output_path, result_image)
+        result_image = None
+        if replay_boxes is not None:
+            boxes_info = replay_boxes[0] if replay_boxes else []
+            # Без боксов изображение не нужно даже читать
+            if not (self.passthrough and not len(boxes_info)):
+                t = time.perf_counter()
+                image = cv2.imread(image_path)
+                timings["decode"] = time.perf_counter() - t
+                t = time.perf_counter()
+                result_image = self._draw_boxes(
+                    image, boxes_info, intensity, blur_type,
+                    inplace=True, blur_mode=blur_mode,
+                )
+                timings["blur"] = time.perf_counter() - t
+        else:
+            boxes_info, result_image = self.detect_objects(
+                image_path, object_types, intensity, blur_type,
+                plan=plan, blur_mode=blur_mode, timings=timings,
+            )
+        if record_boxes is not None:
+            record_boxes.append(boxes_info)
+        timings["detections"] = len(boxes_info)
+
+        t = time.perf_counter()
+        if self.passthrough and not len(boxes_info):
+            self._passthrough(image_path, output_path, timings)
+        else:
+            self._discard_output(output_path)
+            cv2.imwrite(output_path, result_image)
+        timings["encode"] = time.perf_counter() - t
+        if progress_callback is not None:
+            progress_callback(1, 1)
         return output_path
 
+    @staticmethod
+    def _discard_output(output_path: str) -> None:
+        """Удаление прежнего результата перед записью нового.
+
+        Прежний результат может быть жесткой ссылкой на файл кэша или на
+        исходный файл (passthrough), запись поверх него испортила бы их.
+        """
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    @staticmethod
+    def _passthrough(
+        source_path: str, output_path: str, timings: Dict[str, float]
+    ) -> None:
+        """Результат без детекций: исходный файл без перекодирования."""
+        link_or_copy(source_path, output_path)
+        timings["passthrough"] = 1
+
     def process_video(
         self,
         video_path: str,
         object_types: List[str],
         intensity: int,
         blur_type: str,
+        batch_size: Optional[int] = None,
+        keyframe_interval: int = 1,
+        track_padding: float = 0.0,
+        timings: Optional[Dict[str, float]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
     ) -> str:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Не удалось открыть видео файл: {video_path}")
+        """Обработка видео потоковым конвейером.
+
+        Если передан словарь timings, в него записывается время стадий
+        (decode, inference, blur, encode, audio_mux) в секундах.
+        progress_callback вызывается с числом обработанных и всех кадров.
+        С replay_boxes (боксы по кадрам из кэша детекций) инференс
+        пропускается, а в record_boxes записываются боксы каждого кадра.
+        plan задает размер входа моделей (плитки для видео не используются).
+        С passthrough видео, в котором по кэшу детекций нет ни одного бокса,
+        отдается копией исходного файла без декодирования; если боксов не
+        нашлось при обработке, закодированный результат заменяется копией
+        исходного файла (без потери качества при повторном кодировании).
+        """
+        batch_size = max(1, batch_size or self.batch_size)
+        output_path = self._get_output_filename(video_path)
+        timings = {} if timings is None else timings
+
+        # Кэш детекций без единого бокса: видео не нужно даже декодировать
+        if (
+            self.passthrough
+            and replay_boxes
+            and not any(len(boxes) for boxes in replay_boxes)
+        ):
+            t = time.perf_counter()
+            self._passthrough(video_path, output_path, timings)
+            timings.update(frames=len(replay_boxes), detections=0)
+            timings["encode"] = time.perf_counter() - t
+            if progress_callback is not None:
+                progress_callback(len(replay_boxes), len(replay_boxes))
+            return output_path
+
+        self._discard_output(output_path)
+        ffmpeg_path = find_ffmpeg() if self.encoder == "ffmpeg" else None
+        if ffmpeg_path and self.segment_workers > 1:
+            segmented = self._get_segmented_processor()
+            segments = segmented.plan_segments(video_path)
+            if len(segments) > 1:
+                return segmented.process_video(
+                    video_path,
+                    output_path,
+                    segments,
+                    object_types,
+                    intensity,
+                    blur_type,
+                    keyframe_interval=keyframe_interval,
+                    track_padding=track_padding,
+                    timings=timings,
+                    progress_callback=progress_callback,
+                    replay_boxes=replay_boxes,
+                    record_boxes=record_boxes,
+                    plan=plan,
+                    blur_mode=blur_mode,
+                    passthrough=self.passthrough,
+                )
 
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        cap = self._open_video(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        temp_output = self._get_output_filename(video_path).replace(".", "_temp.")
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(temp_output, fourcc, fps, (width, height))
+        progress = None
+        if progress_callback is not None:
+            progress_callback(0, total_frames)
+
+            def progress(done: int) -> None:
+                # Число кадров в метаданных может быть неточным
+                progress_callback(done, max(done, total_frames))
+
+        temp_output = None
+        if ffmpeg_path:
+            # Один проход кодирования, аудио копируется из исходного файла
+            out = FFmpegWriter(
+                output_path, width, height, fps,
+                audio_source=video_path, ffmpeg_path=ffmpeg_path,
+            )
+        else:
+            temp_output = output_path.replace(".", "_temp.")
+            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            out = cv2.VideoWriter(temp_output, fourcc, int(fps), (width, height))
 
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                _, processed_frame = self.detect_objects(
-                    frame, object_types, intensity, blur_type
-                )
-                out.write(processed_frame)
+            stage_timings = self._run_video_pipeline(
+                cap, out, object_types, intensity, blur_type,
+                batch_size, keyframe_interval, track_padding,
+                progress=progress,
+                replay_boxes=replay_boxes,
+                record_boxes=record_boxes,
+                plan=plan,
+                blur_mode=blur_mode,
+            )
         finally:
             cap.release()
             out.release()
 
-        output_path = self._add_audio_to_video(video_path, temp_output)
-        if os.path.exists(temp_output):
-            os.remove(temp_output)
+        if temp_output is None and out.error:
+            raise RuntimeError(f"Ошибка кодирования ffmpeg: {out.error}")
+        if self.passthrough and stage_timings["frames"] and not stage_timings["detections"]:
+            # Ни одного бокса: закодированный результат не нужен, боксы
+            # кадров уже в record_boxes, так что повтор по кэшу тоже отдаст копию
+            self._discard_output(temp_output or output_path)
+            self._passthrough(video_path, output_path, stage_timings)
+            stage_timings["audio_mux"] = 0.0
+        elif temp_output is None:
+            stage_timings["audio_mux"] = 0.0
+        else:
+            mux_start = time.perf_counter()
+            output_path = self._add_audio_to_video(video_path, temp_output)
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+            stage_timings["audio_mux"] = time.perf_counter() - mux_start
+
+        timings.update(stage_timings)
         return output_path
 
+    def process_video_segment(
+        self,
+        video_path: str,
+        output_path: str,
+        start_frame: int,
+        end_frame: Optional[int],
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        keyframe_interval: int = 1,
+        track_padding: float = 0.0,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+    ) -> Dict[str, float]:
+        """Обработка диапазона кадров [start_frame, end_frame) в отдельный файл без звука.
+
+        Используется воркерами сегментного режима. Возвращает время стадий.
+        replay_boxes и record_boxes относятся только к кадрам диапазона.
+        """
+        cap = self._open_video(video_path)
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        max_frames = None if end_frame is None else end_frame - start_frame
+
+        out = FFmpegWriter(output_path, width, height, fps)
+        try:
+            stage_timings = self._run_video_pipeline(
+                cap, out, object_types, intensity, blur_type,
+                self.batch_size, keyframe_interval, track_padding, max_frames,
+                replay_boxes=replay_boxes,
+                record_boxes=record_boxes,
+                plan=plan,
+                blur_mode=blur_mode,
+            )
+        finally:
+            cap.release()
+            out.release()
+        if out.error:
+            raise RuntimeError(f"Ошибка кодирования ffmpeg: {out.error}")
+        return stage_timings
+
+    @staticmethod
+    def _open_video(video_path: str) -> cv2.VideoCapture:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Не удалось открыть видео файл: {video_path}")
+        return cap
+
+    def _run_video_pipeline(
+        self,
+        cap: cv2.VideoCapture,
+        out,
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        batch_size: int,
+        keyframe_interval: int,
+        track_padding: float,
+        max_frames: Optional[int] = None,
+        progress: Optional[Callable[[int], None]] = None,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+    ) -> Dict[str, float]:
+        """Прогон кадров из cap через конвейер с записью в out."""
+        tracker = None
+        if keyframe_interval > 1 and replay_boxes is None:
+            tracker = BoxTracker()
+        imgsz = plan.imgsz if plan is not None else None
+
+        def infer(frames: List[np.ndarray], start_index: int) -> List[Boxes]:
+            if replay_boxes is not None:
+                batch_boxes = replay_boxes[start_index:start_index + len(frames)]
+                return batch_boxes + [[]] * (len(frames) - len(batch_boxes))
+
+            batch_boxes = self._detect_video_batch(
+                frames, start_index, object_types, keyframe_interval, tracker, imgsz
+            )
+            if record_boxes is not None:
+                record_boxes.extend(batch_boxes)
+            return batch_boxes
+
+        def render(frame: np.ndarray, boxes_info: Boxes) -> np.ndarray:
+            if keyframe_interval > 1 and track_padding > 0:
+                boxes_info = self.box_processor.pad_boxes(
+                    boxes_info, track_padding, frame.shape
+                )
+            # Декодированный кадр больше нигде не используется, копия не нужна
+            return self._draw_boxes(
+                frame, boxes_info, intensity, blur_type,
+                inplace=True, blur_mode=blur_mode,
+            )
+
+        pipeline = VideoPipeline(self.queue_size, threaded=self.pipelined)
+        return pipeline.run(
+            self._read_batches(cap, batch_size, max_frames),
+            infer,
+            render,
+            out.write,
+            progress,
+        )
+
+    def _get_segmented_processor(self):
+        """Общий для процесса пул сегментного режима с параметрами детектора."""
+        if self._segmented is None:
+            from app.ml.tools.segmented import get_segmented_processor
+
+            self._segmented = get_segmented_processor(
+                self.segment_workers, self._worker_kwargs, self.min_segment_frames
+            )
+        return self._segmented
+
     def _add_audio_to_video(self, original_video_path: str, processed_video_path: str) -> str:
         output_path = self._get_output_filename(original_video_path)
         try:
@@ -159,23 +792,226 @@ class MLObjectDetector:
             os.rename(processed_video_path, output_path)
         return output_path
 
+    def _result_cache_key(
+        self,
+        content_hash: str,
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        keyframe_interval: int,
+        track_padding: float,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+    ) -> str:
+        """Ключ кэша результатов: содержимое файла, параметры и версии моделей."""
+        params = {
+            "blur_type": blur_type,
+            "intensity": intensity,
+            "track_padding": track_padding if keyframe_interval > 1 else 0.0,
+        }
+        # Ключи прежних результатов (прямоугольники) остаются действительными
+        if blur_mode != "box":
+            params["blur_mode"] = blur_mode
+        params.update(self._detection_params(object_types, keyframe_interval, plan))
+        return ResultCache.make_key(content_hash, params)
+
+    def _detection_cache_key(
+        self,
+        content_hash: str,
+        object_types: List[str],
+        keyframe_interval: int,
+        plan: Optional[ResolutionPlan] = None,
+    ) -> str:
+        """Ключ кэша детекций: только параметры, влияющие на боксы."""
+        return DetectionCache.make_key(
+            content_hash, self._detection_params(object_types, keyframe_interval, plan)
+        )
+
+    def _detection_params(
+        self,
+        object_types: List[str],
+        keyframe_interval: int,
+        plan: Optional[ResolutionPlan],
+    ) -> dict:
+        """Параметры, от которых зависят найденные боксы."""
+        params = {
+            "object_types": sorted(object_types),
+            "keyframe_interval": keyframe_interval,
+            "confidence_threshold": self.confidence_threshold,
+            "models": [model.version for model in self.models],
+        }
+        if plan is not None:
+            params["imgsz"] = plan.imgsz
+            params["tiles"] = [plan.tile_size, plan.tile_overlap]
+        return params
+
     def process_file(
         self,
         file_path: str,
         object_types: List[str],
         intensity: int,
         blur_type: str,
+        keyframe_interval: int = 1,
+        track_padding: float = 0.0,
+        timings: Optional[Dict[str, float]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        content_hash: Optional[str] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
     ) -> str:
+        """Обработка изображения или видео с учетом кэша результатов.
+
+        content_hash - sha256 содержимого файла, если он уже известен
+        (например, посчитан при загрузке); иначе считается по файлу.
+        plan - адаптивный размер входа моделей и плитки (plan_for_file).
+        blur_mode - "box" (размытие прямоугольников) или "mask" (эллипсов).
+        В timings записывается время стадий, вызовов моделей и total.
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Файл не найден: {file_path}")
 
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        model_seconds = self._model_seconds_snapshot()
+
+        if self.result_cache is not None or self.detection_cache is not None:
+            content_hash = content_hash or file_content_hash(file_path)
+
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._result_cache_key(
+                content_hash,
+                object_types,
+                intensity,
+                blur_type,
+                keyframe_interval,
+                track_padding,
+                plan,
+                blur_mode,
+            )
+            cached_path = self.result_cache.get(cache_key)
+            if cached_path is not None:
+                output_path = self._get_output_filename(file_path)
+                link_or_copy(cached_path, output_path)
+                if progress_callback is not None:
+                    progress_callback(1, 1)
+                self._record_file_metrics(file_path, timings, start, model_seconds, "result")
+                return output_path
+
+            self._discard_output(self._get_output_filename(file_path))
+
+        detection_key = None
+        replay_boxes = None
+        record_boxes = None
+        if self.detection_cache is not None:
+            detection_key = self._detection_cache_key(
+                content_hash, object_types, keyframe_interval, plan
+            )
+            replay_boxes = self.detection_cache.load(detection_key)
+            if replay_boxes is None:
+                record_boxes = []
+
+        output_path = self._process_file_uncached(
+            file_path,
+            object_types,
+            intensity,
+            blur_type,
+            keyframe_interval=keyframe_interval,
+            track_padding=track_padding,
+            timings=timings,
+            progress_callback=progress_callback,
+            replay_boxes=replay_boxes,
+            record_boxes=record_boxes,
+            plan=plan,
+            blur_mode=blur_mode,
+        )
+        if record_boxes is not None:
+            self.detection_cache.save(detection_key, record_boxes)
+        if cache_key is not None:
+            self.result_cache.put(cache_key, output_path)
+        self._record_file_metrics(
+            file_path, timings, start, model_seconds,
+            "detection" if replay_boxes is not None else "miss",
+        )
+        return output_path
+
+    def _model_seconds_snapshot(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return dict(self._model_seconds)
+
+    def _record_file_metrics(
+        self,
+        file_path: str,
+        timings: Dict[str, float],
+        start: float,
+        model_seconds: Dict[str, float],
+        cache: str,
+    ) -> None:
+        """Запись времени обработки файла в timings и метрики процесса.
+
+        Время вызовов моделей - приращение счетчиков детектора за время
+        обработки файла (при параллельных запросах в него попадают и чужие
+        вызовы; в сегментной обработке модели работают в других процессах).
+        """
+        for key, value in self._model_seconds_snapshot().items():
+            delta = value - model_seconds.get(key, 0.0)
+            if delta > 0:
+                timings[key] = delta
+        timings["total"] = time.perf_counter() - start
+
+        ext = os.path.splitext(file_path)[-1].lower()
+        media = "video" if ext in VIDEO_EXTENSIONS else "image"
+        for stage in STAGES:
+            if stage in timings:
+                STAGE_SECONDS.observe(timings[stage], stage=stage, media=media)
+        FILES_TOTAL.inc(media=media, cache=cache)
+        if timings.get("frames"):
+            FRAMES_TOTAL.inc(timings["frames"])
+
+    def _process_file_uncached(
+        self,
+        file_path: str,
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        keyframe_interval: int = 1,
+        track_padding: float = 0.0,
+        timings: Optional[Dict[str, float]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+    ) -> str:
         file_ext = os.path.splitext(file_path)[-1].lower()
-        image_extensions = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif"}
-        video_extensions = {".mp4", ".avi", ".mov", ".mkv", ".wmv", ".flv"}
 
-        if file_ext in image_extensions:
-            return self.process_image(file_path, object_types, intensity, blur_type)
-        if file_ext in video_extensions:
-            return self.process_video(file_path, object_types, intensity, blur_type)
+        if file_ext in IMAGE_EXTENSIONS:
+            return self.process_image(
+                file_path,
+                object_types,
+                intensity,
+                blur_type,
+                progress_callback=progress_callback,
+                timings=timings,
+                replay_boxes=replay_boxes,
+                record_boxes=record_boxes,
+                plan=plan,
+                blur_mode=blur_mode,
+            )
+        if file_ext in VIDEO_EXTENSIONS:
+            return self.process_video(
+                file_path,
+                object_types,
+                intensity,
+                blur_type,
+                keyframe_interval=keyframe_interval,
+                track_padding=track_padding,
+                timings=timings,
+                progress_callback=progress_callback,
+                replay_boxes=replay_boxes,
+                record_boxes=record_boxes,
+                plan=plan,
+                blur_mode=blur_mode,
+            )
         raise ValueError(f"Неподдерживаемый формат файла: {file_ext}")
 
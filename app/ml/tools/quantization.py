@@ -0,0 +1,125 @@
+import importlib.util
+import os
+from functools import lru_cache
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+# Расширения изображений, используемых для калибровки статического INT8
+CALIBRATION_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+@lru_cache(maxsize=None)
+def int8_available() -> bool:
+    """Установлены ли onnx и onnxruntime, без которых квантование INT8 невозможно"""
+    return all(importlib.util.find_spec(name) is not None for name in ("onnx", "onnxruntime"))
+
+
+def letterbox(image: np.ndarray, imgsz: int = 640) -> np.ndarray:
+    """
+    Приведение изображения к входу YOLO: вписывание в квадрат imgsz
+    с серыми полями, RGB, NCHW, значения 0..1
+    """
+    height, width = image.shape[:2]
+    scale = imgsz / max(height, width)
+    resized = cv2.resize(
+        image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_LINEAR
+    )
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    tensor = canvas[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor)
+
+
+def load_calibration_images(calibration_dir: str, limit: int = 100) -> List[np.ndarray]:
+    """Изображения каталога калибровки (не более limit штук)"""
+    if not calibration_dir or not os.path.isdir(calibration_dir):
+        raise ValueError(
+            f"Для статического INT8 нужен каталог с изображениями калибровки: {calibration_dir}"
+        )
+    images = []
+    for name in sorted(os.listdir(calibration_dir)):
+        if os.path.splitext(name)[-1].lower() not in CALIBRATION_EXTENSIONS:
+            continue
+        image = cv2.imread(os.path.join(calibration_dir, name))
+        if image is not None:
+            images.append(image)
+        if len(images) >= limit:
+            break
+    if not images:
+        raise ValueError(f"В каталоге калибровки нет изображений: {calibration_dir}")
+    return images
+
+
+def _copy_metadata(source_path: str, target_path: str) -> None:
+    """Перенос метаданных ultralytics (имена классов, размер входа) в новую модель"""
+    import onnx
+
+    source = onnx.load(source_path, load_external_data=False)
+    target = onnx.load(target_path)
+    del target.metadata_props[:]
+    target.metadata_props.extend(source.metadata_props)
+    onnx.save(target, target_path)
+
+
+def quantize_onnx(
+    source_path: str,
+    target_path: str,
+    mode: str,
+    calibration_dir: Optional[str] = None,
+    imgsz: int = 640,
+) -> str:
+    """
+    Квантование ONNX модели в INT8 средствами ONNX Runtime
+
+    Args:
+        source_path: Исходная модель FP32 (экспорт ultralytics)
+        target_path: Путь для квантованной модели
+        mode: "dynamic" - веса INT8, активации квантуются на лету;
+            "static" - масштабы активаций заранее считаются на калибровочных
+            изображениях из calibration_dir
+        calibration_dir: Каталог изображений калибровки (для static)
+        imgsz: Размер входа при калибровке
+
+    Returns:
+        Путь к квантованной модели
+    """
+    try:
+        from onnxruntime.quantization import (
+            CalibrationDataReader,
+            QuantFormat,
+            QuantType,
+            quantize_dynamic,
+            quantize_static,
+        )
+    except ImportError as e:
+        raise RuntimeError("Для INT8 требуется пакет onnxruntime") from e
+
+    if mode == "dynamic":
+        quantize_dynamic(source_path, target_path, weight_type=QuantType.QUInt8)
+    elif mode == "static":
+        images = load_calibration_images(calibration_dir)
+
+        class _Reader(CalibrationDataReader):
+            def __init__(self):
+                self._batches = iter([{"images": letterbox(image, imgsz)} for image in images])
+
+            def get_next(self):
+                return next(self._batches, None)
+
+        quantize_static(
+            source_path,
+            target_path,
+            _Reader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    else:
+        raise ValueError(f"Неизвестный режим квантования: {mode}")
+
+    _copy_metadata(source_path, target_path)
+    return target_path
@@ -0,0 +1,244 @@
+import math
+import os
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+
+# Минимальный размер объекта на входе модели (пиксели), который YOLO еще
+# уверенно находит
+MIN_OBJECT_PX = 12
+# Разрешение, при котором задана стоимость инференса
+BASE_IMGSZ = 640
+# Шаг сетки YOLO, размер входа кратен ему
+STRIDE = 32
+# Относительная стоимость инференса вариантов YOLO11 при одинаковом imgsz (m = 1)
+MODEL_SIZE_COST = {"n": 0.1, "s": 0.3, "m": 1.0, "l": 1.3, "x": 2.9}
+# Буква размера в имени весов: yolo11m.pt, yolov11m-face.pt
+_SIZE_PATTERN = re.compile(r"(yolov?\d+)([nsmlx])(?=[-_.])")
+
+
+class ResolutionPlan(NamedTuple):
+    """Выбранные параметры инференса для файла"""
+
+    # Размер входа модели (длинная сторона)
+    imgsz: int
+    # Вариант модели: n, s, m, ...
+    model_size: str
+    # Сторона плитки в пикселях исходного изображения, 0 - без плиток
+    tile_size: int = 0
+    # Перекрытие соседних плиток в пикселях исходного изображения
+    tile_overlap: int = 0
+
+
+def _round_up(value: float) -> int:
+    return int(math.ceil(value / STRIDE) * STRIDE)
+
+
+def _round_down(value: float) -> int:
+    return max(STRIDE, int(value // STRIDE) * STRIDE)
+
+
+def model_size_of(model_path: str) -> Optional[str]:
+    """Буква размера модели из имени файла весов или None"""
+    match = _SIZE_PATTERN.search(os.path.basename(model_path))
+    return match.group(2) if match else None
+
+
+def model_size_path(model_path: str, size: str) -> str:
+    """Путь к весам того же семейства с другим размером модели"""
+    name = _SIZE_PATTERN.sub(lambda m: m.group(1) + size, os.path.basename(model_path), count=1)
+    return os.path.join(os.path.dirname(model_path), name)
+
+
+def available_model_sizes(model_path: str, sizes: Sequence[str]) -> List[str]:
+    """Размеры из sizes, для которых рядом с model_path есть файл весов"""
+    current = model_size_of(model_path)
+    if current is None:
+        return []
+    return [
+        size for size in sizes
+        if size == current or os.path.exists(model_size_path(model_path, size))
+    ]
+
+
+def tile_grid(width: int, height: int, tile_size: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Плитки (x_min, y_min, x_max, y_max), покрывающие изображение с перекрытием
+
+    Плитки равномерно распределяются по каждой оси, последняя прижимается
+    к краю, поэтому все плитки одного размера.
+    """
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        count = math.ceil((length - overlap) / (tile_size - overlap))
+        step = (length - tile_size) / (count - 1)
+        return [round(i * step) for i in range(count)]
+
+    return [
+        (x, y, min(width, x + tile_size), min(height, y + tile_size))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def plan_resolution(
+    width: int,
+    height: int,
+    min_face_size: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    base_latency_ms: float = 400.0,
+    model_sizes: Sequence[str] = ("m",),
+    max_imgsz: int = 1280,
+    min_imgsz: int = 320,
+    allow_tiling: bool = False,
+) -> ResolutionPlan:
+    """
+    Выбор разрешения инференса, размера модели и режима плиток
+
+    Разрешение выбирается так, чтобы лицо размером min_face_size пикселей
+    исходного кадра занимало на входе модели не меньше MIN_OBJECT_PX,
+    но не больше исходного размера (увеличение кадра деталей не добавляет).
+    Если для этого нужен вход больше max_imgsz, изображение (allow_tiling)
+    делится на плитки, каждая из которых обрабатывается при max_imgsz.
+    Затем из доступных размеров модели выбирается самый крупный, который
+    укладывается в latency_budget_ms; если не укладывается ни один, берется
+    самый маленький, а разрешение уменьшается до бюджета.
+
+    Args:
+        width: Ширина кадра
+        height: Высота кадра
+        min_face_size: Минимальный размер лица в пикселях, которое нужно найти
+        latency_budget_ms: Бюджет времени инференса одного кадра
+        base_latency_ms: Время инференса модели m при imgsz 640 на этом CPU
+        model_sizes: Доступные размеры модели
+        max_imgsz: Наибольший вход модели без плиток
+        min_imgsz: Наименьший вход модели
+        allow_tiling: Разрешить режим плиток (для изображений)
+
+    Returns:
+        План инференса
+    """
+    long_side = max(width, height)
+    native = _round_up(long_side)
+    if min_face_size:
+        needed = _round_up(MIN_OBJECT_PX * long_side / min_face_size)
+    else:
+        needed = BASE_IMGSZ
+    imgsz = max(min(needed, native, max_imgsz), min(min_imgsz, native))
+
+    tile_size = tile_overlap = 0
+    tiles = 1
+    if allow_tiling and min_face_size and min(needed, native) > max_imgsz:
+        # Плитка такого размера при входе max_imgsz сохраняет нужный масштаб
+        tile_size = int(max_imgsz * long_side / min(needed, native))
+        tile_overlap = min(tile_size // 2, 2 * min_face_size)
+        # Плитки и общий проход по всему изображению для крупных лиц
+        tiles = len(tile_grid(width, height, tile_size, tile_overlap)) + 1
+
+    sizes = sorted(
+        [size for size in model_sizes if size in MODEL_SIZE_COST],
+        key=MODEL_SIZE_COST.get,
+    ) or ["m"]
+
+    def latency(size: str, side: int, count: int) -> float:
+        return base_latency_ms * MODEL_SIZE_COST[size] * (side / BASE_IMGSZ) ** 2 * count
+
+    if latency_budget_ms is None:
+        return ResolutionPlan(imgsz, sizes[-1], tile_size, tile_overlap)
+
+    for size in reversed(sizes):
+        if latency(size, imgsz, tiles) <= latency_budget_ms:
+            return ResolutionPlan(imgsz, size, tile_size, tile_overlap)
+
+    # Ни один размер не укладывается: без плиток и с уменьшенным входом
+    smallest = sizes[0]
+    fitted = BASE_IMGSZ * math.sqrt(latency_budget_ms / latency(smallest, BASE_IMGSZ, 1))
+    imgsz = max(min(_round_down(fitted), imgsz), min(min_imgsz, native))
+    return ResolutionPlan(imgsz, smallest)
+
+
+def media_resolution(file_path: str) -> Tuple[int, int]:
+    """Ширина и высота изображения или кадра видео (читается только заголовок)"""
+    try:
+        from PIL import Image
+
+        with Image.open(file_path) as image:
+            return image.size
+    except Exception:
+        pass
+
+    cap = cv2.VideoCapture(file_path)
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Не удалось определить разрешение: {file_path}")
+    return width, height
+
+
+def plan_for_file(
+    file_path: str,
+    face_model_path: str,
+    min_face_size: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    base_latency_ms: float = 400.0,
+    model_sizes: Sequence[str] = ("n", "s", "m"),
+    max_imgsz: int = 1280,
+    allow_tiling: bool = True,
+) -> ResolutionPlan:
+    """
+    План инференса для файла: разрешение берется из заголовка, размеры
+    модели - из весов, лежащих рядом с face_model_path. Плитки
+    используются только для изображений.
+    """
+    from app.ml.tools.object_detector import IMAGE_EXTENSIONS
+
+    width, height = media_resolution(file_path)
+    is_image = os.path.splitext(file_path)[-1].lower() in IMAGE_EXTENSIONS
+    return plan_resolution(
+        width,
+        height,
+        min_face_size=min_face_size,
+        latency_budget_ms=latency_budget_ms,
+        base_latency_ms=base_latency_ms,
+        model_sizes=available_model_sizes(face_model_path, model_sizes),
+        max_imgsz=max_imgsz,
+        allow_tiling=allow_tiling and is_image,
+    )
+
+
+def model_paths_for_size(
+    face_model_path: str, general_model_path: str, size: Optional[str]
+) -> Tuple[str, str]:
+    """Веса моделей нужного размера; если файла варианта нет, остаются исходные"""
+    if size is None:
+        return face_model_path, general_model_path
+    paths = []
+    for path in (face_model_path, general_model_path):
+        variant = model_size_path(path, size)
+        paths.append(variant if os.path.exists(variant) else path)
+    return paths[0], paths[1]
+
+
+def plan_for_request(file_path: str, options, face_model_path: str) -> Optional[ResolutionPlan]:
+    """
+    План инференса по параметрам запроса (Options) и настройкам сервиса,
+    None - если адаптивный режим в запросе не включен
+    """
+    from app.config import settings
+
+    if not options.adaptive_resolution:
+        return None
+    return plan_for_file(
+        file_path,
+        face_model_path,
+        min_face_size=options.min_face_size,
+        latency_budget_ms=options.latency_budget_ms,
+        base_latency_ms=settings.inference_latency_ms,
+        model_sizes=[s.strip() for s in settings.adaptive_model_sizes.split(",") if s.strip()],
+        max_imgsz=settings.adaptive_max_imgsz,
+    )
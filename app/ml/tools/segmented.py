@@ -0,0 +1,282 @@
+import math
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from app.ml.tools.resolution import ResolutionPlan
+from app.ml.tools.video_writer import audio_codec_for, find_ffmpeg
+from app.tools.result_cache import link_or_copy
+from app.ml.tools.write_box import Boxes
+
+# Детектор процесса-воркера, создается один раз при запуске процесса
+_worker_detector = None
+
+
+def _init_worker(detector_kwargs: dict, torch_threads: int) -> None:
+    """Загрузка моделей в процессе-воркере"""
+    global _worker_detector
+    try:
+        import torch
+
+        # Без ограничения каждый процесс займет все ядра под свои потоки torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    from app.ml.tools.object_detector import MLObjectDetector
+
+    _worker_detector = MLObjectDetector(**detector_kwargs)
+    _worker_detector.initialize()
+
+
+def _process_segment(task: tuple) -> Tuple[Dict[str, float], List[Boxes]]:
+    """Обработка одного отрезка видео в процессе-воркере, возвращает время стадий и боксы"""
+    video_path, output_path, start_frame, end_frame, args, kwargs = task
+    record_boxes: List[Boxes] = []
+    timings = _worker_detector.process_video_segment(
+        video_path, output_path, start_frame, end_frame, *args,
+        record_boxes=record_boxes, **kwargs
+    )
+    return timings, record_boxes
+
+
+class SegmentedVideoProcessor:
+    """Параллельная обработка длинного видео по отрезкам в нескольких процессах.
+
+    Видео делится на диапазоны кадров, каждый диапазон кодируется отдельным
+    процессом со своими загруженными моделями, после чего отрезки склеиваются
+    ffmpeg без перекодирования, а аудио копируется из исходного файла.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        detector_kwargs: Optional[dict] = None,
+        min_segment_frames: int = 900,
+    ):
+        """
+        Инициализация процессора
+
+        Args:
+            workers: Количество процессов (по умолчанию - число ядер)
+            detector_kwargs: Параметры MLObjectDetector для воркеров
+            min_segment_frames: Минимальная длина отрезка в кадрах
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.detector_kwargs = dict(detector_kwargs or {})
+        self.min_segment_frames = max(1, min_segment_frames)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.detector_kwargs, torch_threads),
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """Остановка процессов-воркеров"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def plan_segments(self, video_path: str) -> List[Tuple[int, Optional[int]]]:
+        """
+        Разбиение видео на диапазоны кадров
+
+        Args:
+            video_path: Путь к видео
+
+        Returns:
+            Список диапазонов (start_frame, end_frame); у последнего end_frame
+            равен None, так как число кадров в метаданных может быть неточным
+        """
+        total = self._frame_count(video_path)
+        count = min(self.workers, total // self.min_segment_frames)
+        if count <= 1:
+            return [(0, None)]
+
+        step = math.ceil(total / count)
+        bounds = [i * step for i in range(count)]
+        return [
+            (start, bounds[i + 1] if i + 1 < count else None)
+            for i, start in enumerate(bounds)
+        ]
+
+    def process_video(
+        self,
+        video_path: str,
+        output_path: str,
+        segments: List[Tuple[int, Optional[int]]],
+        object_types: List[str],
+        intensity: int,
+        blur_type: str,
+        keyframe_interval: int = 1,
+        track_padding: float = 0.0,
+        timings: Optional[Dict[str, float]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        replay_boxes: Optional[List[Boxes]] = None,
+        record_boxes: Optional[List[Boxes]] = None,
+        plan: Optional[ResolutionPlan] = None,
+        blur_mode: str = "box",
+        passthrough: bool = False,
+    ) -> str:
+        """
+        Обработка видео по отрезкам и склейка результата
+
+        Args:
+            video_path: Путь к видео
+            output_path: Путь к итоговому видео
+            segments: Диапазоны кадров из plan_segments()
+            object_types, intensity, blur_type, keyframe_interval,
+            track_padding: Параметры обработки, как у MLObjectDetector.process_video
+            timings: Словарь для суммарного времени стадий по всем отрезкам
+            progress_callback: Вызывается с числом обработанных и всех кадров
+                по мере завершения отрезков
+            replay_boxes: Боксы по кадрам из кэша детекций, инференс пропускается
+            record_boxes: Список, в который записываются боксы всех кадров
+            plan: Размер входа моделей
+            blur_mode: Форма размытия: "box" или "mask"
+            passthrough: Если ни в одном отрезке нет боксов, отдать вместо
+                склейки жесткую ссылку на исходный файл
+
+        Returns:
+            Путь к обработанному видео
+        """
+        args = (object_types, intensity, blur_type)
+        kwargs = dict(
+            keyframe_interval=keyframe_interval, track_padding=track_padding, plan=plan,
+            blur_mode=blur_mode,
+        )
+
+        def segment_kwargs(start_frame: int, end_frame: Optional[int]) -> dict:
+            if replay_boxes is None:
+                return kwargs
+            return dict(kwargs, replay_boxes=replay_boxes[start_frame:end_frame])
+
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(video_path) or None) as tmp:
+            tasks = [
+                (video_path, os.path.join(tmp, f"segment_{i:04d}.mp4"), s, e, args,
+                 segment_kwargs(s, e))
+                for i, (s, e) in enumerate(segments)
+            ]
+            pool = self._get_pool()
+            futures = [pool.submit(_process_segment, task) for task in tasks]
+            total = self._frame_count(video_path)
+            done = 0
+            if progress_callback is not None:
+                progress_callback(done, total)
+            for future in as_completed(futures):
+                done += future.result()[0].get("frames", 0)
+                if progress_callback is not None:
+                    progress_callback(done, max(done, total))
+            segment_timings = [future.result()[0] for future in futures]
+            if record_boxes is not None:
+                for future in futures:
+                    record_boxes.extend(future.result()[1])
+
+            concat_start = time.perf_counter()
+            no_detections = passthrough and not any(t.get("detections") for t in segment_timings)
+            if no_detections:
+                link_or_copy(video_path, output_path)
+            else:
+                self._concat(video_path, [task[1] for task in tasks], output_path, tmp)
+            concat_time = time.perf_counter() - concat_start
+
+        if timings is not None:
+            for key in ("decode", "inference", "blur", "encode", "frames", "detections"):
+                timings[key] = sum(t.get(key, 0) for t in segment_timings)
+            timings["audio_mux"] = concat_time
+            timings["wall"] = time.perf_counter() - start
+            timings["segments"] = len(segments)
+            if no_detections:
+                timings["passthrough"] = 1
+        return output_path
+
+    @staticmethod
+    def _frame_count(video_path: str) -> int:
+        cap = cv2.VideoCapture(video_path)
+        try:
+            return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _concat(
+        video_path: str, segment_paths: List[str], output_path: str, tmp_dir: str
+    ) -> None:
+        """Склейка отрезков без перекодирования видео и перенос аудио исходника"""
+        list_path = os.path.join(tmp_dir, "segments.txt")
+        with open(list_path, "w") as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        ffmpeg_path = find_ffmpeg()
+        command = [
+            ffmpeg_path, "-y", "-loglevel", "error", "-nostats",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", video_path,
+            "-map", "0:v:0", "-map", "1:a?",
+            "-c:v", "copy", "-c:a", audio_codec_for(ffmpeg_path, video_path, output_path),
+        ]
+        if os.path.splitext(output_path)[-1].lower() in {".mp4", ".mov"}:
+            command += ["-movflags", "+faststart"]
+        command.append(output_path)
+
+        completed = subprocess.run(command, capture_output=True)
+        if completed.returncode != 0:
+            raise RuntimeError(
+                f"Ошибка склейки отрезков: {completed.stderr.decode(errors='replace').strip()}"
+            )
+
+
+_processors: Dict[tuple, SegmentedVideoProcessor] = {}
+_processors_lock = threading.Lock()
+
+
+def get_segmented_processor(
+    workers: int, detector_kwargs: dict, min_segment_frames: int = 900
+) -> SegmentedVideoProcessor:
+    """
+    Общий для процесса сегментный процессор
+
+    Детекторы создаются по одному на поток и на точность весов, а пул
+    процессов-воркеров (каждый со своими моделями) один на набор параметров
+    детектора, поэтому веса в воркерах не загружаются повторно.
+    Пулы останавливаются shutdown_segmented_processors().
+    """
+    key = (workers, min_segment_frames, tuple(sorted(detector_kwargs.items())))
+    with _processors_lock:
+        processor = _processors.get(key)
+        if processor is None:
+            processor = SegmentedVideoProcessor(
+                workers=workers,
+                detector_kwargs=detector_kwargs,
+                min_segment_frames=min_segment_frames,
+            )
+            _processors[key] = processor
+    return processor
+
+
+def shutdown_segmented_processors() -> None:
+    """Остановка процессов-воркеров всех сегментных процессоров"""
+    with _processors_lock:
+        processors = list(_processors.values())
+        _processors.clear()
+    for processor in processors:
+        processor.close()
@@ -0,0 +1,130 @@
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+class BoxTracker:
+    """Перенос боксов между ключевыми кадрами с помощью оптического потока"""
+
+    def __init__(
+        self,
+        scene_change_threshold: float = 30.0,
+        max_points_per_box: int = 20,
+        work_width: int = 640,
+    ):
+        """
+        Инициализация трекера
+
+        Args:
+            scene_change_threshold: Средняя абсолютная разница уменьшенных
+                кадров (0-255), начиная с которой кадр считается сменой сцены
+            max_points_per_box: Максимальное число отслеживаемых точек в боксе
+            work_width: Ширина кадра, до которой он уменьшается для трекинга
+        """
+        self.scene_change_threshold = scene_change_threshold
+        self.max_points_per_box = max_points_per_box
+        self.work_width = work_width
+        self._prev_gray: Optional[np.ndarray] = None
+        self._prev_thumb: Optional[np.ndarray] = None
+        self._boxes: List[dict] = []
+        self._scale = 1.0
+
+    def _prepare(self, frame: np.ndarray):
+        """Уменьшенное серое изображение для трекинга и миниатюра для сравнения"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        width = gray.shape[1]
+        scale = min(1.0, self.work_width / width)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        thumb = cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA)
+        return gray, thumb, scale
+
+    def reset(self, frame: np.ndarray, boxes_info: List[dict]) -> None:
+        """
+        Запоминание кадра с боксами, полученными детекцией
+
+        Args:
+            frame: Кадр, на котором выполнялась детекция
+            boxes_info: Найденные боксы
+        """
+        self._prev_gray, self._prev_thumb, self._scale = self._prepare(frame)
+        self._boxes = [dict(box) for box in boxes_info]
+
+    def is_scene_change(self, frame: np.ndarray) -> bool:
+        """Проверка, сменилась ли сцена относительно последнего кадра"""
+        if self._prev_thumb is None:
+            return True
+        _, thumb, _ = self._prepare(frame)
+        diff = cv2.absdiff(thumb, self._prev_thumb)
+        return float(diff.mean()) > self.scene_change_threshold
+
+    def track(self, frame: np.ndarray) -> List[dict]:
+        """
+        Перенос боксов на новый кадр
+
+        Для каждого бокса ищутся характерные точки, их смещение оценивается
+        пирамидальным методом Лукаса-Канаде, а бокс сдвигается на медианное
+        смещение. Если точки не найдены, бокс остается на месте.
+
+        Args:
+            frame: Следующий кадр видео
+
+        Returns:
+            Список боксов на новом кадре
+        """
+        if self._prev_gray is None:
+            raise ValueError("Трекер не инициализирован. Вызовите reset() сначала")
+
+        gray, thumb, scale = self._prepare(frame)
+        height, width = frame.shape[:2]
+
+        points = []
+        owners = []
+        for index, box in enumerate(self._boxes):
+            x_min, y_min, x_max, y_max = [int(c * self._scale) for c in box["coordinates"]]
+            if x_max <= x_min or y_max <= y_min:
+                continue
+            mask = np.zeros_like(self._prev_gray)
+            mask[y_min:y_max, x_min:x_max] = 255
+            found = cv2.goodFeaturesToTrack(
+                self._prev_gray,
+                maxCorners=self.max_points_per_box,
+                qualityLevel=0.01,
+                minDistance=3,
+                mask=mask,
+            )
+            if found is not None:
+                points.append(found)
+                owners.extend([index] * len(found))
+
+        shifts = {}
+        if points:
+            prev_points = np.concatenate(points).astype(np.float32)
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self._prev_gray, gray, prev_points, None
+            )
+            owners_arr = np.asarray(owners)
+            ok = status.reshape(-1) == 1
+            delta = (next_points - prev_points).reshape(-1, 2)
+            for index in set(owners):
+                selected = ok & (owners_arr == index)
+                if selected.any():
+                    shifts[index] = np.median(delta[selected], axis=0) / scale
+
+        tracked = []
+        for index, box in enumerate(self._boxes):
+            dx, dy = shifts.get(index, (0.0, 0.0))
+            x_min, y_min, x_max, y_max = box["coordinates"]
+            moved = dict(box)
+            moved["coordinates"] = [
+                int(np.clip(x_min + dx, 0, width)),
+                int(np.clip(y_min + dy, 0, height)),
+                int(np.clip(x_max + dx, 0, width)),
+                int(np.clip(y_max + dy, 0, height)),
+            ]
+            tracked.append(moved)
+
+        self._prev_gray, self._prev_thumb, self._scale = gray, thumb, scale
+        self._boxes = tracked
+        return [dict(box) for box in tracked]
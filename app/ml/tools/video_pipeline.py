@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Маркер конца потока кадров между стадиями
+_END = object()
+
+
+class VideoPipeline:
+    """Потоковая обработка видео стадиями: декодирование, инференс, размытие, кодирование.
+
+    Декодирование и размытие+кодирование выполняются в отдельных потоках,
+    инференс - в вызывающем потоке. Стадии связаны очередями ограниченного
+    размера, поэтому в памяти одновременно находится лишь несколько батчей
+    кадров. OpenCV и torch отпускают GIL, так что стадии работают параллельно.
+    """
+
+    def __init__(self, queue_size: int = 2, threaded: bool = True):
+        """
+        Инициализация конвейера
+
+        Args:
+            queue_size: Максимальное число батчей в каждой очереди между стадиями
+            threaded: False - выполнять все стадии последовательно в одном потоке
+        """
+        self.queue_size = max(1, queue_size)
+        self.threaded = threaded
+
+    def run(
+        self,
+        batches: Iterable[List[np.ndarray]],
+        infer: Callable[[List[np.ndarray], int], List[List[dict]]],
+        render: Callable[[np.ndarray, List[dict]], np.ndarray],
+        write: Callable[[np.ndarray], None],
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> Dict[str, float]:
+        """
+        Прогон всех кадров через конвейер
+
+        Args:
+            batches: Источник батчей декодированных кадров
+            infer: Функция (кадры, номер первого кадра) -> боксы по кадрам
+            render: Функция (кадр, боксы) -> обработанный кадр
+            write: Функция записи обработанного кадра
+            progress: Вызывается с числом записанных кадров после каждого батча
+
+        Returns:
+            Суммарное время каждой стадии в секундах, общее время, число
+            кадров и боксов на всех кадрах
+        """
+        timings = {
+            "decode": 0.0,
+            "inference": 0.0,
+            "blur": 0.0,
+            "encode": 0.0,
+            "frames": 0,
+            "detections": 0,
+        }
+        written = [0]
+
+        def write_batch(frames, batch_boxes) -> None:
+            self._render_and_write(frames, batch_boxes, render, write, timings)
+            written[0] += len(frames)
+            if progress is not None:
+                progress(written[0])
+
+        start = time.perf_counter()
+        if self.threaded:
+            self._run_threaded(batches, infer, write_batch, timings)
+        else:
+            self._run_sequential(batches, infer, write_batch, timings)
+        timings["wall"] = time.perf_counter() - start
+        return timings
+
+    @staticmethod
+    def _render_and_write(frames, batch_boxes, render, write, timings) -> None:
+        for frame, boxes_info in zip(frames, batch_boxes):
+            t = time.perf_counter()
+            processed = render(frame, boxes_info)
+            timings["blur"] += time.perf_counter() - t
+            timings["detections"] += len(boxes_info)
+
+            t = time.perf_counter()
+            write(processed)
+            timings["encode"] += time.perf_counter() - t
+
+    def _run_sequential(self, batches, infer, write_batch, timings) -> None:
+        iterator = iter(batches)
+        while True:
+            t = time.perf_counter()
+            frames = next(iterator, None)
+            timings["decode"] += time.perf_counter() - t
+            if frames is None:
+                break
+
+            t = time.perf_counter()
+            batch_boxes = infer(frames, timings["frames"])
+            timings["inference"] += time.perf_counter() - t
+            timings["frames"] += len(frames)
+
+            write_batch(frames, batch_boxes)
+
+    def _run_threaded(self, batches, infer, write_batch, timings) -> None:
+        decoded: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        inferred: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def put(target: queue.Queue, item) -> bool:
+            # Ожидание места в очереди с проверкой остановки конвейера
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source: queue.Queue):
+            while True:
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return _END
+
+        def fail(error: BaseException) -> None:
+            errors.append(error)
+            stop.set()
+
+        def decode_stage() -> None:
+            try:
+                iterator = iter(batches)
+                while not stop.is_set():
+                    t = time.perf_counter()
+                    frames = next(iterator, None)
+                    timings["decode"] += time.perf_counter() - t
+                    if frames is None or not put(decoded, frames):
+                        break
+            except BaseException as e:
+                fail(e)
+            finally:
+                put(decoded, _END)
+
+        def encode_stage() -> None:
+            try:
+                while True:
+                    item = get(inferred)
+                    if item is _END:
+                        break
+                    write_batch(*item)
+            except BaseException as e:
+                fail(e)
+
+        decoder = threading.Thread(target=decode_stage, daemon=True)
+        encoder = threading.Thread(target=encode_stage, daemon=True)
+        decoder.start()
+        encoder.start()
+
+        try:
+            while True:
+                frames = get(decoded)
+                if frames is _END:
+                    break
+
+                t = time.perf_counter()
+                batch_boxes = infer(frames, timings["frames"])
+                timings["inference"] += time.perf_counter() - t
+                timings["frames"] += len(frames)
+
+                if not put(inferred, (frames, batch_boxes)):
+                    break
+        except BaseException as e:
+            fail(e)
+        finally:
+            put(inferred, _END)
+            decoder.join()
+            encoder.join()
+
+        if errors:
+            raise errors[0]
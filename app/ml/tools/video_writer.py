@@ -0,0 +1,176 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+
+def find_ffmpeg() -> Optional[str]:
+    """
+    Поиск исполняемого файла ffmpeg
+
+    Сначала используется бинарник из пакета imageio-ffmpeg (зависимость
+    moviepy), затем ffmpeg из PATH.
+
+    Returns:
+        Путь к ffmpeg или None, если он недоступен
+    """
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+def audio_codec_for(ffmpeg_path: str, audio_source: str, output_path: str) -> str:
+    """
+    Кодек аудио для результата: "copy", если дорожку исходного видео можно
+    без перекодирования поместить в контейнер output_path, иначе "aac"
+
+    Кадры передаются ffmpeg потоком и не могут быть записаны повторно,
+    поэтому копирование проверяется заранее пробной записью доли секунды
+    аудио в контейнер того же формата.
+    """
+    ext = os.path.splitext(output_path)[-1].lower() or ".mp4"
+    with tempfile.TemporaryDirectory() as tmp:
+        completed = subprocess.run(
+            [
+                ffmpeg_path, "-y", "-loglevel", "error", "-nostats",
+                "-i", audio_source, "-map", "0:a?", "-c:a", "copy", "-t", "0.1",
+                os.path.join(tmp, f"probe{ext}"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    return "copy" if completed.returncode == 0 else "aac"
+
+
+class FFmpegWriter:
+    """Кодирование кадров в H.264 одним процессом ffmpeg.
+
+    Кадры передаются в stdin ffmpeg без промежуточного файла, а аудиодорожка
+    исходного видео (если есть) копируется в результат без перекодирования;
+    если контейнер результата не поддерживает ее кодек, аудио кодируется
+    в AAC. Интерфейс повторяет cv2.VideoWriter: write() и release().
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        width: int,
+        height: int,
+        fps: float,
+        audio_source: Optional[str] = None,
+        ffmpeg_path: Optional[str] = None,
+        crf: int = 23,
+        preset: str = "veryfast",
+    ):
+        """
+        Запуск процесса ffmpeg
+
+        Args:
+            output_path: Путь к итоговому видео
+            width: Ширина кадров
+            height: Высота кадров
+            fps: Частота кадров
+            audio_source: Видео, из которого копируется аудиодорожка
+            ffmpeg_path: Путь к ffmpeg (по умолчанию find_ffmpeg())
+            crf: Качество libx264 (меньше - лучше)
+            preset: Пресет скорости libx264
+        """
+        ffmpeg_path = ffmpeg_path or find_ffmpeg()
+        if ffmpeg_path is None:
+            raise RuntimeError("ffmpeg не найден")
+
+        self.output_path = output_path
+        self.frame_size = (height, width)
+        self.error: Optional[str] = None
+        self._released = False
+        # Журнал ffmpeg - во временном файле вне каталога результатов
+        self._stderr = tempfile.TemporaryFile(prefix="ffmpeg_")
+        audio_codec = (
+            audio_codec_for(ffmpeg_path, audio_source, output_path) if audio_source else None
+        )
+        self._proc = subprocess.Popen(
+            self._build_command(
+                ffmpeg_path, output_path, width, height, fps, audio_source, crf, preset,
+                audio_codec,
+            ),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr,
+        )
+
+    @staticmethod
+    def _build_command(
+        ffmpeg_path: str,
+        output_path: str,
+        width: int,
+        height: int,
+        fps: float,
+        audio_source: Optional[str],
+        crf: int,
+        preset: str,
+        audio_codec: Optional[str] = "copy",
+    ) -> List[str]:
+        command = [
+            ffmpeg_path, "-y", "-loglevel", "error", "-nostats",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", f"{fps:.6f}",
+            "-i", "-",
+        ]
+        if audio_source:
+            command += ["-i", audio_source]
+        command += ["-map", "0:v:0"]
+        if audio_source:
+            # "?" - аудио необязательно, видео без звука тоже обрабатывается
+            command += ["-map", "1:a?", "-c:a", audio_codec or "copy"]
+        command += [
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            # yuv420p требует четных размеров кадра
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-pix_fmt", "yuv420p",
+        ]
+        if os.path.splitext(output_path)[-1].lower() in {".mp4", ".mov"}:
+            command += ["-movflags", "+faststart"]
+        command.append(output_path)
+        return command
+
+    def _read_error(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()
+
+    def write(self, frame: np.ndarray) -> None:
+        """Передача одного кадра BGR в кодировщик"""
+        if frame.shape[:2] != self.frame_size:
+            raise ValueError(
+                f"Размер кадра {frame.shape[:2]} не совпадает с {self.frame_size}"
+            )
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except (BrokenPipeError, OSError):
+            self._proc.wait()
+            raise RuntimeError(f"Ошибка кодирования ffmpeg: {self._read_error()}")
+
+    def release(self) -> None:
+        """
+        Завершение кодирования
+
+        Ошибка ffmpeg не выбрасывается, а сохраняется в атрибуте error,
+        чтобы не скрывать исключение, возникшее при обработке кадров.
+        """
+        if self._released:
+            return
+        self._released = True
+        if self._proc.stdin and not self._proc.stdin.closed:
+            try:
+                self._proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        returncode = self._proc.wait()
+        if returncode != 0:
+            self.error = self._read_error() or f"код завершения {returncode}"
+        self._stderr.close()
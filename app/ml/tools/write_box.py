@@ -1,7 +1,219 @@
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
 import cv2
 import numpy as np
 
+from app.ml.tools.detections import Detections
+
+# Боксы в виде массивов или списка словарей (совместимый формат)
+Boxes = Union[Detections, List[dict]]
+
+# Гауссово размытие ROI с короткой стороной не меньше DOWNSCALE_MIN_SIDE * factor
+# выполняется в уменьшенном в factor раз виде: при большом ядре результат
+# визуально тот же, а работы в factor² раз меньше
+DOWNSCALE_MIN_SIDE = 64
+
+
+@lru_cache(maxsize=None)
+def motion_kernel(intensity: int) -> np.ndarray:
+    """Одномерное ядро горизонтального размытия движения (1 x k)"""
+    k = intensity * 2 + 1
+    return np.full((1, k), 1.0 / k, dtype=np.float32)
+
+
+def _downscale_factor(k: int, height: int, width: int) -> int:
+    """Во сколько раз можно уменьшить ROI перед гауссовым размытием ядром k"""
+    factor = 4 if k >= 15 else 2 if k >= 7 else 1
+    while factor > 1 and min(height, width) < DOWNSCALE_MIN_SIDE * factor:
+        factor //= 2
+    return factor
+
+
+def _blur_downscaled(roi: np.ndarray, factor: int, blur) -> np.ndarray:
+    """Размытие blur в уменьшенной в factor раз копии ROI с увеличением обратно"""
+    h, w = roi.shape[:2]
+    # INTER_AREA быстр только при целом коэффициенте, поэтому уменьшается
+    # часть ROI, кратная factor (отброшенные < factor пикселей по краю
+    # восстанавливаются при увеличении)
+    small = cv2.resize(
+        roi[:h - h % factor, :w - w % factor], (w // factor, h // factor),
+        interpolation=cv2.INTER_AREA,
+    )
+    return cv2.resize(blur(small), (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def blur_roi(
+    roi: np.ndarray, intensity: int, blur_type: str, reduced: bool = False
+) -> np.ndarray:
+    """
+    Размытие одной области изображения
+
+    Args:
+        roi: Область изображения
+        intensity: Степень размытия от 1 до 10
+        blur_type: Тип размытия: "gaussian", "motion" или "pixelate"
+        reduced: Размывать движение тоже в уменьшенном разрешении
+            (для больших областей режима маски)
+
+    Returns:
+        Размытая область того же размера
+    """
+    h, w = roi.shape[:2]
+    if blur_type == "pixelate":
+        factor = max(1, intensity * 5)
+        down_w = max(1, w // factor)
+        down_h = max(1, h // factor)
+        temp = cv2.resize(roi, (down_w, down_h), interpolation=cv2.INTER_LINEAR)
+        return cv2.resize(temp, (w, h), interpolation=cv2.INTER_NEAREST)
+
+    k = intensity * 2 + 1
+    factor = _downscale_factor(k, h, w)
+    if blur_type == "motion":
+        if reduced and factor > 1:
+            small_intensity = max(1, intensity // factor)
+            return _blur_downscaled(
+                roi, factor,
+                lambda small: cv2.filter2D(small, -1, motion_kernel(small_intensity)),
+            )
+        # Ядро k x k с единственной ненулевой строкой эквивалентно строке 1 x k
+        return cv2.filter2D(roi, -1, motion_kernel(intensity))
+
+    if factor == 1:
+        return cv2.GaussianBlur(roi, (k, k), 0)
+
+    small_k = max(3, (k // factor) | 1)
+    return _blur_downscaled(
+        roi, factor, lambda small: cv2.GaussianBlur(small, (small_k, small_k), 0)
+    )
+
+
+def _clip_boxes(boxes_info: Boxes, image_shape: tuple) -> Tuple[np.ndarray, int]:
+    """Координаты непустых боксов, обрезанные по кадру, и их суммарная площадь"""
+    height, width = image_shape[:2]
+    if isinstance(boxes_info, Detections):
+        xyxy = boxes_info.xyxy
+    else:
+        xyxy = np.array(
+            [box["coordinates"] for box in boxes_info], dtype=np.int32
+        ).reshape(-1, 4)
+    xyxy = np.clip(xyxy, 0, [width, height, width, height])
+    sizes = np.clip(xyxy[:, 2:] - xyxy[:, :2], 0, None)
+    return xyxy[(sizes > 0).all(axis=1)], int(sizes.prod(axis=1).sum())
+
+
+def ellipse_mask(xyxy: np.ndarray, shape: tuple) -> np.ndarray:
+    """Маска (uint8, 255 внутри) эллипсов, вписанных в боксы"""
+    mask = np.zeros(shape[:2], dtype=np.uint8)
+    for x_min, y_min, x_max, y_max in xyxy.tolist():
+        center = ((x_min + x_max) // 2, (y_min + y_max) // 2)
+        axes = (max(1, (x_max - x_min) // 2), max(1, (y_max - y_min) // 2))
+        cv2.ellipse(mask, center, axes, 0, 0, 360, 255, thickness=-1)
+    return mask
+
+
+# Группа боксов для размытия: охватывающий прямоугольник, боксы внутри
+# него (None - прямоугольник совпадает с единственным боксом) и признак
+# размытия прямоугольника целиком
+BoxGroup = Tuple[Tuple[int, int, int, int], Optional[np.ndarray], bool]
+
+
+def _bounding_rect(xyxy: np.ndarray) -> Tuple[int, int, int, int]:
+    """Прямоугольник, охватывающий все боксы"""
+    return (
+        int(xyxy[:, 0].min()), int(xyxy[:, 1].min()),
+        int(xyxy[:, 2].max()), int(xyxy[:, 3].max()),
+    )
+
+
+def merge_boxes(xyxy: np.ndarray) -> List[BoxGroup]:
+    """
+    Объединение пересекающихся и вложенных боксов перед размытием
+
+    Боксы, вложенные в другие, отбрасываются. Оставшиеся боксы, связанные
+    цепочкой пересечений, объединяются в охватывающий прямоугольник, если
+    его площадь не больше суммарной площади боксов (иначе объединение
+    добавило бы работы, и боксы группы размываются по отдельности).
+
+    Args:
+        xyxy: Координаты боксов (N, 4)
+
+    Returns:
+        Список групп (прямоугольник, боксы внутри него или None, если
+        прямоугольник совпадает с единственным боксом, размывать ли
+        прямоугольник целиком)
+    """
+    count = len(xyxy)
+    if count == 0:
+        return []
+
+    x_min, y_min, x_max, y_max = (xyxy[:, i].astype(np.int64) for i in range(4))
+    index = np.arange(count)
+    # Бокс вложен, если его содержит другой бокс (из одинаковых остается первый)
+    contains = (
+        (x_min[:, None] <= x_min[None, :]) & (y_min[:, None] <= y_min[None, :])
+        & (x_max[:, None] >= x_max[None, :]) & (y_max[:, None] >= y_max[None, :])
+    )
+    identical = contains & contains.T
+    contains &= ~identical | (index[:, None] < index[None, :])
+    np.fill_diagonal(contains, False)
+    keep = ~contains.any(axis=0)
+    xyxy = xyxy[keep]
+    x_min, y_min, x_max, y_max = x_min[keep], y_min[keep], x_max[keep], y_max[keep]
+    count = len(xyxy)
+
+    overlap = (
+        (x_min[:, None] < x_max[None, :]) & (x_min[None, :] < x_max[:, None])
+        & (y_min[:, None] < y_max[None, :]) & (y_min[None, :] < y_max[:, None])
+    )
+    # Компоненты связности: каждый бокс получает наименьшую метку среди
+    # пересекающихся с ним, пока метки не перестанут меняться
+    labels = np.arange(count)
+    while True:
+        updated = np.minimum(np.where(overlap, labels[None, :], count).min(axis=1), labels)
+        if np.array_equal(updated, labels):
+            break
+        labels = updated[updated]
+
+    areas = (x_max - x_min) * (y_max - y_min)
+    groups = []
+    for label in np.unique(labels):
+        in_group = labels == label
+        members = xyxy[in_group]
+        if len(members) == 1:
+            groups.append((tuple(int(v) for v in members[0]), None, True))
+            continue
+        rect = _bounding_rect(members)
+        merged = (rect[2] - rect[0]) * (rect[3] - rect[1]) <= areas[in_group].sum()
+        groups.append((rect, members, bool(merged)))
+    return groups
+
+
+def _blur_separately(
+    region: np.ndarray, members: np.ndarray, intensity: int, blur_type: str
+) -> int:
+    """
+    Размытие пересекающихся боксов по отдельности внутри области region
+
+    Все боксы размываются по исходным пикселям, а в кадр каждый переносит
+    только пиксели, еще не покрытые предыдущими боксами, так что пересечения
+    не размываются повторно.
+
+    Returns:
+        Площадь объединения боксов
+    """
+    members = members - members[:, [0, 1, 0, 1]].min(axis=0)
+    blurred = [
+        blur_roi(region[y_min:y_max, x_min:x_max], intensity, blur_type)
+        for x_min, y_min, x_max, y_max in members.tolist()
+    ]
+    covered = np.zeros(region.shape[:2], dtype=bool)
+    for (x_min, y_min, x_max, y_max), box_blurred in zip(members.tolist(), blurred):
+        box_covered = covered[y_min:y_max, x_min:x_max]
+        roi = region[y_min:y_max, x_min:x_max]
+        np.copyto(roi, box_blurred, where=~box_covered[..., None])
+        box_covered[...] = True
+    return int(covered.sum())
+
 
 class BoxProcessor:
     """Класс для обработки и визуализации боксов с помощью OpenCV"""
@@ -9,60 +221,170 @@ class BoxProcessor:
     @staticmethod
     def draw_boxes(
         image: np.ndarray,
-        boxes_info: List[dict],
+        boxes_info: Boxes,
         intensity: int = 5,
         blur_type: str = "gaussian",
+        inplace: bool = False,
+        merge: bool = True,
+        stats: Optional[Dict[str, int]] = None,
     ) -> np.ndarray:
         """Применение размытия внутри бокса на изображении.
 
+        С merge вложенные боксы не размываются повторно, а группы
+        пересекающихся боксов размываются одним охватывающим прямоугольником,
+        из которого в кадр копируются только пиксели самих боксов
+        (см. merge_boxes). Пересекающиеся боксы, размываемые по отдельности,
+        записывают в кадр каждый пиксель один раз.
+
         Args:
             image: Изображение в формате numpy array
-            boxes_info: Информация о боксах
+            boxes_info: Боксы (Detections или список словарей)
             intensity: Степень размытия от 1 до 10
             blur_type: Тип размытия: "gaussian", "motion" или "pixelate"
+            inplace: Размывать области прямо в image без копии всего
+                изображения (когда исходный кадр больше не нужен)
+            merge: Объединять пересекающиеся боксы перед размытием
+            stats: Словарь, в котором накапливаются box_pixels (суммарная
+                площадь боксов) и blurred_pixels (фактически размытая площадь:
+                охватывающие прямоугольники объединенных групп и объединение
+                остальных боксов)
 
         Returns:
             Изображение с размытыми боксами
         """
-        result_image = image.copy()
+        result_image = image if inplace else image.copy()
+        xyxy, box_pixels = _clip_boxes(boxes_info, result_image.shape)
 
-        for box in boxes_info:
-            x_min, y_min, x_max, y_max = box["coordinates"]
+        groups = merge_boxes(xyxy)
+        if not merge:
+            groups = [(rect, members, members is None) for rect, members, _ in groups]
 
+        blurred_pixels = 0
+        for (x_min, y_min, x_max, y_max), members, merged in groups:
             roi = result_image[y_min:y_max, x_min:x_max]
+            if not merged:
+                blurred_pixels += _blur_separately(roi, members, intensity, blur_type)
+                continue
+            blurred = blur_roi(roi, intensity, blur_type)
+            blurred_pixels += roi.shape[0] * roi.shape[1]
+            if members is None:
+                roi[...] = blurred
+                continue
+            # Пиксели вне боксов остаются исходными, пересечения копируются
+            # повторно, но копирование на порядок дешевле размытия
+            for bx_min, by_min, bx_max, by_max in (members - [x_min, y_min, x_min, y_min]).tolist():
+                roi[by_min:by_max, bx_min:bx_max] = blurred[by_min:by_max, bx_min:bx_max]
+
+        if stats is not None:
+            stats["box_pixels"] = stats.get("box_pixels", 0) + box_pixels
+            stats["blurred_pixels"] = stats.get("blurred_pixels", 0) + blurred_pixels
+
+        return result_image
+
+    @staticmethod
+    def draw_mask(
+        image: np.ndarray,
+        boxes_info: Boxes,
+        intensity: int = 5,
+        blur_type: str = "gaussian",
+        inplace: bool = False,
+        stats: Optional[Dict[str, int]] = None,
+    ) -> np.ndarray:
+        """Размытие только эллипсов, вписанных в боксы, за один проход.
+
+        Область, охватывающая все боксы, размывается один раз (большие
+        области - в уменьшенном разрешении, см. blur_roi),
+        после чего переносится в кадр через общую маску эллипсов. Стоимость
+        почти не зависит от числа объектов в кадре.
+
+        Args:
+            image: Изображение в формате numpy array
+            boxes_info: Боксы (Detections или список словарей)
+            intensity: Степень размытия от 1 до 10
+            blur_type: Тип размытия: "gaussian", "motion" или "pixelate"
+            inplace: Размывать прямо в image без копии всего изображения
+            stats: Словарь, в котором накапливаются box_pixels и blurred_pixels
+
+        Returns:
+            Изображение с размытыми эллипсами
+        """
+        result_image = image if inplace else image.copy()
+        xyxy, box_pixels = _clip_boxes(boxes_info, result_image.shape)
+
+        blurred_pixels = 0
+        if len(xyxy):
+            x_min, y_min = xyxy[:, :2].min(axis=0).tolist()
+            x_max, y_max = xyxy[:, 2:].max(axis=0).tolist()
+            region = result_image[y_min:y_max, x_min:x_max]
+            mask = ellipse_mask(xyxy - [x_min, y_min, x_min, y_min], region.shape)
+            # copyTo пишет через маску прямо в область кадра
+            cv2.copyTo(blur_roi(region, intensity, blur_type, reduced=True), mask, region)
+            blurred_pixels = region.shape[0] * region.shape[1]
 
-            if blur_type == "pixelate":
-                h, w = roi.shape[:2]
-                factor = max(1, intensity * 5)
-                down_w = max(1, w // factor)
-                down_h = max(1, h // factor)
-                temp = cv2.resize(roi, (down_w, down_h), interpolation=cv2.INTER_LINEAR)
-                blurred_roi = cv2.resize(temp, (w, h), interpolation=cv2.INTER_NEAREST)
-            elif blur_type == "motion":
-                k = intensity * 2 + 1
-                kernel = np.zeros((k, k))
-                kernel[int((k - 1) / 2), :] = 1.0 / k
-                blurred_roi = cv2.filter2D(roi, -1, kernel)
-            else:
-                k = intensity * 2 + 1
-                blurred_roi = cv2.GaussianBlur(roi, (k, k), 0)
-
-            result_image[y_min:y_max, x_min:x_max] = blurred_roi
+        if stats is not None:
+            stats["box_pixels"] = stats.get("box_pixels", 0) + box_pixels
+            stats["blurred_pixels"] = stats.get("blurred_pixels", 0) + blurred_pixels
 
         return result_image
     
     @staticmethod
-    def filter_boxes_by_area(boxes_info: List[dict], min_area: int = 500) -> List[dict]:
+    def pad_boxes(
+        boxes_info: Boxes, padding: float, image_shape: tuple
+    ) -> Boxes:
+        """
+        Расширение боксов на долю их размера с каждой стороны
+        
+        Args:
+            boxes_info: Боксы (Detections или список словарей)
+            padding: Доля ширины/высоты бокса, добавляемая с каждой стороны
+            image_shape: Размер изображения (height, width, ...)
+            
+        Returns:
+            Новые боксы того же вида с расширенными координатами
+        """
+        height, width = image_shape[:2]
+
+        if isinstance(boxes_info, Detections):
+            xyxy = boxes_info.xyxy
+            pad = np.stack(
+                [xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]], axis=1
+            ) * padding
+            pad = np.tile(pad.astype(np.int32), 2) * np.array([-1, -1, 1, 1])
+            padded = np.clip(xyxy + pad, 0, [width, height, width, height])
+            return Detections(padded, boxes_info.conf, boxes_info.cls, boxes_info.names)
+
+        padded_boxes = []
+
+        for box in boxes_info:
+            x_min, y_min, x_max, y_max = box['coordinates']
+            pad_x = int((x_max - x_min) * padding)
+            pad_y = int((y_max - y_min) * padding)
+            padded = dict(box)
+            padded['coordinates'] = [
+                max(0, x_min - pad_x),
+                max(0, y_min - pad_y),
+                min(width, x_max + pad_x),
+                min(height, y_max + pad_y),
+            ]
+            padded_boxes.append(padded)
+
+        return padded_boxes
+    
+    @staticmethod
+    def filter_boxes_by_area(boxes_info: Boxes, min_area: int = 500) -> Boxes:
         """
         Фильтрация боксов по минимальной площади
         
         Args:
-            boxes_info: Информация о боксах
+            boxes_info: Боксы (Detections или список словарей)
             min_area: Минимальная площадь бокса
             
         Returns:
-            Отфильтрованный список боксов
+            Отфильтрованные боксы того же вида
         """
+        if isinstance(boxes_info, Detections):
+            return boxes_info.select(boxes_info.area >= min_area)
+
         filtered_boxes = []
         
         for box in boxes_info:
@@ -76,15 +398,17 @@ class BoxProcessor:
         return filtered_boxes
     
     @staticmethod
-    def filter_boxes_by_confidence(boxes_info: List[dict], min_confidence: float = 0.7) -> List[dict]:
+    def filter_boxes_by_confidence(boxes_info: Boxes, min_confidence: float = 0.7) -> Boxes:
         """
         Фильтрация боксов по уверенности
         
         Args:
-            boxes_info: Информация о боксах
+            boxes_info: Боксы (Detections или список словарей)
             min_confidence: Минимальная уверенность
             
         Returns:
-            Отфильтрованный список боксов
+            Отфильтрованные боксы того же вида
         """
+        if isinstance(boxes_info, Detections):
+            return boxes_info.select(boxes_info.conf >= min_confidence)
         return [box for box in boxes_info if box['confidence'] >= min_confidence]
@@ -0,0 +1,109 @@
+import os
+from typing import Dict, List, Literal, Optional
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from app.schemas.uploadfile import (
+    ProcessRequest,
+    JobSubmitResponse,
+    JobStatusResponse,
+    JobCancelResponse,
+    JobClassStats,
+)
+from app.config import settings
+from app.ml.ml_executor import get_ml_executor
+from app.routers.video import UPLOAD_FOLDER, FormPrecision, build_options
+from app.tools.generate_name_file import generate_name_file
+from app.tools.upload import UploadTooLargeError, save_upload_file
+
+
+router = APIRouter()
+
+
+@router.post("/jobs", response_model=JobSubmitResponse)
+async def submit_upload(
+    file: UploadFile = File(...),
+    blur_amount: int = Form(..., ge=1, le=10),
+    blur_type: str = Form(...),
+    object_types: str = Form(...),
+    keyframe_interval: int = Form(1, ge=1, le=60),
+    track_padding: float = Form(0.15, ge=0.0, le=1.0),
+    precision: FormPrecision = Form(None),
+    adaptive_resolution: bool = Form(False),
+    latency_budget_ms: Optional[int] = Form(None, ge=1),
+    min_face_size: Optional[int] = Form(None, ge=4),
+    blur_mode: Literal["box", "mask"] = Form("box"),
+    profile: bool = Form(False),
+) -> JobSubmitResponse:
+    """Загрузка файла и постановка в очередь, ответ возвращается сразу.
+
+    С profile=true обработка выполняется под cProfile, путь к профилю
+    появляется в profile_path задачи.
+    """
+    options = build_options(
+        blur_amount, blur_type, object_types, keyframe_interval, track_padding,
+        precision, adaptive_resolution, latency_budget_ms, min_face_size,
+        blur_mode,
+    )
+    if options is None:
+        raise HTTPException(status_code=422, detail="Unsupported blur type")
+
+    # Уникальное имя, чтобы одинаковые имена файлов разных задач не пересекались
+    file_ext = file.filename.split(".")[-1].lower()
+    file_path = os.path.join(UPLOAD_FOLDER, generate_name_file(file.filename, file_ext))
+    try:
+        _, content_hash = await save_upload_file(
+            file, file_path, settings.max_upload_size, settings.upload_chunk_size
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # Оценка стоимости читает файл, поэтому выполняется вне event loop
+    processor = get_ml_executor()
+    cost = await run_in_threadpool(processor.estimate_cost, file_path)
+    job_id = processor.add_to_queue(file_path, options, content_hash, profile, cost)
+    return JobSubmitResponse(job_id=job_id, status="pending")
+
+
+@router.post("/jobs/process", response_model=JobSubmitResponse)
+async def submit_process(request: ProcessRequest, profile: bool = False) -> JobSubmitResponse:
+    """Постановка в очередь уже загруженного файла (profile - как в /jobs)."""
+    if not os.path.exists(request.file_path):
+        raise HTTPException(status_code=404, detail=f"Файл не найден: {request.file_path}")
+
+    processor = get_ml_executor()
+    cost = await run_in_threadpool(processor.estimate_cost, request.file_path)
+    job_id = processor.add_to_queue(
+        request.file_path, request.options, profile=profile, cost=cost
+    )
+    return JobSubmitResponse(job_id=job_id, status="pending")
+
+
+@router.get("/jobs", response_model=List[JobStatusResponse])
+async def list_jobs() -> List[JobStatusResponse]:
+    statuses = get_ml_executor().get_all_statuses()
+    return [JobStatusResponse(**info) for info in statuses.values()]
+
+
+@router.get("/jobs/stats", response_model=Dict[str, JobClassStats])
+async def get_jobs_stats() -> Dict[str, JobClassStats]:
+    """Время ожидания и обработки по классам задач (image/video)."""
+    return get_ml_executor().get_queue_stats()
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str) -> JobStatusResponse:
+    status = get_ml_executor().get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return JobStatusResponse(**status)
+
+
+@router.delete("/jobs/{job_id}", response_model=JobCancelResponse)
+async def cancel_job(job_id: str) -> JobCancelResponse:
+    """Отмена задачи, которая еще ожидает в очереди."""
+    executor = get_ml_executor()
+    if executor.get_status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return JobCancelResponse(job_id=job_id, cancelled=executor.cancel(job_id))
@@ -1,39 +1,269 @@
+import asyncio
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Literal, Optional, Tuple, Union
 
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 
 from app.schemas.uploadfile import (
+    BatchProcessRequest,
+    BatchProcessResponse,
     ProcessRequest,
     ProcessResponse,
     SuccessResponse,
     ErrorResponse,
+    Options,
+    Precision,
 )
-from app.ml.tools.object_detector import MLObjectDetector
+from app.config import settings
+from app.ml.tools.object_detector import (
+    FACE_MODEL_PATH,
+    GENERAL_MODEL_PATH,
+    IMAGE_EXTENSIONS,
+    MLObjectDetector,
+)
+from app.ml.tools.micro_batcher import get_micro_batcher
+from app.ml.tools.model import resolve_backend
+from app.ml.tools.model_registry import get_model_registry
+from app.ml.tools.resolution import model_paths_for_size, plan_for_request
+from app.tools.bounded_executor import BoundedExecutor, ExecutorSaturatedError
 from app.tools.generate_name_file import generate_name_file
+from app.tools.detection_cache import get_detection_cache
+from app.tools.result_cache import get_result_cache
+from app.tools.upload import UploadTooLargeError, save_upload_file
 
 
 router = APIRouter()
 
 UPLOAD_FOLDER = "uploads"
+# Точность весов в форме загрузки, пустое значение - точность по умолчанию
+FormPrecision = Optional[Union[Precision, Literal[""]]]
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-detector = MLObjectDetector()
-try:
-    detector.initialize()
-except Exception:
-    pass
+# Обработка выполняется в пуле потоков, чтобы не блокировать event loop
+executor = BoundedExecutor(settings.max_concurrent_jobs, settings.max_queued_jobs)
+_thread_state = threading.local()
+
+
+def get_detector(
+    precision: Optional[str] = None, model_size: Optional[str] = None
+) -> MLObjectDetector:
+    """Детектор текущего потока пула.
+
+    Для каждой точности весов и размера модели создается свой детектор
+    при первом запросе; веса моделей общие для всех детекторов процесса
+    (ModelRegistry), вызовы одной модели выполняются по очереди.
+    """
+    precision = precision or settings.model_precision
+    detectors = getattr(_thread_state, "detectors", None)
+    if detectors is None:
+        detectors = _thread_state.detectors = {}
+    detector = detectors.get((precision, model_size))
+    if detector is None:
+        face_model_path, general_model_path = model_paths_for_size(
+            FACE_MODEL_PATH, GENERAL_MODEL_PATH, model_size
+        )
+        detector = MLObjectDetector(
+            face_model_path,
+            general_model_path,
+            result_cache=get_result_cache(),
+            detection_cache=get_detection_cache(),
+            backend=settings.model_backend,
+            precision=precision,
+            calibration_dir=settings.quantization_calibration_dir,
+            micro_batcher=get_micro_batcher(),
+            passthrough=settings.no_detection_passthrough,
+            segment_workers=settings.segment_workers,
+            min_segment_frames=settings.min_segment_frames,
+        )
+        detector.initialize()
+        detectors[(precision, model_size)] = detector
+    return detector
+
+
+def warm_up_models() -> None:
+    """Загрузка и пробный прогон моделей детектора по умолчанию."""
+    precision = settings.model_precision
+    backend = resolve_backend(settings.model_backend, precision)
+    registry = get_model_registry()
+    registry.warm_up([
+        registry.get(path, backend, precision, settings.quantization_calibration_dir)
+        for path in (FACE_MODEL_PATH, GENERAL_MODEL_PATH)
+    ])
+
+
+def _process(
+    file_path: str,
+    options: Options,
+    content_hash: Optional[str] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> str:
+    plan = plan_for_request(file_path, options, FACE_MODEL_PATH)
+    detector = get_detector(options.precision, plan.model_size if plan else None)
+    return detector.process_file(
+        file_path,
+        options.object_types,
+        options.intensity,
+        options.blur_type,
+        keyframe_interval=options.keyframe_interval,
+        track_padding=options.track_padding,
+        timings=timings,
+        content_hash=content_hash,
+        plan=plan,
+        blur_mode=options.blur_mode,
+    )
+
+
+def _process_response(
+    file_path: str, options: Options, content_hash: Optional[str] = None
+) -> ProcessResponse:
+    """Обработка одного файла пакета, ошибка не прерывает остальные файлы."""
+    start = time.time()
+    try:
+        processed_path = _process(file_path, options, content_hash)
+        return SuccessResponse(
+            success=True,
+            processed_path=processed_path,
+            processed_size=os.path.getsize(processed_path),
+            processing_time_ms=int((time.time() - start) * 1000),
+        )
+    except Exception as e:
+        return ErrorResponse(success=False, error_message=str(e))
+
+
+def _process_many(
+    items: List[Tuple[str, Options, Optional[str]]]
+) -> List[ProcessResponse]:
+    """Параллельная обработка изображений пакета.
+
+    Изображения обрабатываются в нескольких потоках, поэтому попадают
+    в общие батчи моделей (MicroBatcher). Результаты возвращаются
+    в порядке items.
+    """
+    workers = min(len(items), max(1, settings.micro_batch_size))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        return list(pool.map(lambda item: _process_response(*item), items))
+
+
+async def _run_batch(
+    items: List[Tuple[str, Options, Optional[str]]]
+) -> List[ProcessResponse]:
+    """Обработка файлов пакета в пуле executor.
+
+    Все изображения пакета обрабатываются вместе в одном месте пула
+    (_process_many), каждое видео занимает свое место, поэтому пакет
+    подчиняется MAX_CONCURRENT_JOBS и очереди пула. Если пул заполнен
+    еще до постановки первой части пакета, выбрасывается
+    ExecutorSaturatedError; части, не поместившиеся позже, получают
+    ошибку в своих результатах.
+    """
+    images = [
+        i for i, (file_path, _, _) in enumerate(items)
+        if os.path.splitext(file_path)[-1].lower() in IMAGE_EXTENSIONS
+    ]
+    image_set = set(images)
+    parts = [([i], _process_response, items[i]) for i in range(len(items)) if i not in image_set]
+    if images:
+        parts.insert(0, (images, _process_many, ([items[i] for i in images],)))
+
+    results: List[Optional[ProcessResponse]] = [None] * len(items)
+    futures = []
+    for indices, fn, args in parts:
+        try:
+            future = executor.submit(fn, *args)
+        except ExecutorSaturatedError as e:
+            if not futures:
+                raise
+            for i in indices:
+                results[i] = ErrorResponse(success=False, error_message=str(e))
+            continue
+        futures.append((indices, asyncio.wrap_future(future)))
+
+    for indices, future in futures:
+        part = await future
+        for i, result in zip(indices, part if isinstance(part, list) else [part]):
+            results[i] = result
+    return results
+
+
+BLUR_MAP = {
+    "gaus": "gaussian",
+    "gaussian": "gaussian",
+    "motion": "motion",
+    "pixelization": "pixelate",
+    "pixelate": "pixelate",
+}
+
+
+def build_options(
+    blur_amount: int,
+    blur_type: str,
+    object_types: str,
+    keyframe_interval: int = 1,
+    track_padding: float = 0.15,
+    precision: Optional[str] = None,
+    adaptive_resolution: bool = False,
+    latency_budget_ms: Optional[int] = None,
+    min_face_size: Optional[int] = None,
+    blur_mode: str = "box",
+) -> Optional[Options]:
+    """Options из полей формы загрузки, None для неизвестного типа размытия.
+
+    Недопустимое сочетание параметров (например, INT8 без пакетов
+    квантования) отклоняется HTTPException 422.
+    """
+    mapped_blur = BLUR_MAP.get(blur_type.lower())
+    if not mapped_blur:
+        return None
+
+    object_types_list = [obj.strip() for obj in object_types.split(",") if obj.strip()]
+    try:
+        return Options(
+            blur_type=mapped_blur,
+            intensity=blur_amount,
+            object_types=object_types_list,
+            keyframe_interval=keyframe_interval,
+            track_padding=track_padding,
+            precision=precision or None,
+            adaptive_resolution=adaptive_resolution,
+            latency_budget_ms=latency_budget_ms,
+            min_face_size=min_face_size,
+            blur_mode=blur_mode,
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422, detail="; ".join(error["msg"] for error in e.errors())
+        )
+
+
+def saturated_response(error: ExecutorSaturatedError) -> JSONResponse:
+    """Быстрый отказ 503, когда пул обработки и очередь заполнены."""
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "error_message": str(error), **error.stats},
+        headers={"Retry-After": "5"},
+    )
+
+
+def too_large_response(error: UploadTooLargeError) -> JSONResponse:
+    """Ответ 413 для файла больше допустимого размера."""
+    return JSONResponse(
+        status_code=413,
+        content={"success": False, "error_message": str(error)},
+    )
 
 
 @router.post("/process", response_model=ProcessResponse)
 async def process_file(request: ProcessRequest) -> ProcessResponse:
     start = time.time()
+    timings = {} if request.include_timings else None
     try:
-        processed_path = detector.process_file(
-            request.file_path,
-            request.options.object_types,
-            request.options.intensity,
-            request.options.blur_type,
+        processed_path = await executor.run(
+            _process, request.file_path, request.options, None, timings
         )
         processed_size = os.path.getsize(processed_path)
         processing_time_ms = int((time.time() - start) * 1000)
@@ -42,7 +272,10 @@ async def process_file(request: ProcessRequest) -> ProcessResponse:
             processed_path=processed_path,
             processed_size=processed_size,
             processing_time_ms=processing_time_ms,
+            timings=timings,
         )
+    except ExecutorSaturatedError as e:
+        return saturated_response(e)
     except Exception as e:
         return ErrorResponse(success=False, error_message=str(e))
 
@@ -53,44 +286,38 @@ async def upload_file(
     blur_amount: int = Form(..., ge=1, le=10),
     blur_type: str = Form(...),
     object_types: str = Form(...),
+    keyframe_interval: int = Form(1, ge=1, le=60),
+    track_padding: float = Form(0.15, ge=0.0, le=1.0),
+    precision: FormPrecision = Form(None),
+    adaptive_resolution: bool = Form(False),
+    latency_budget_ms: Optional[int] = Form(None, ge=1),
+    min_face_size: Optional[int] = Form(None, ge=4),
+    blur_mode: Literal["box", "mask"] = Form("box"),
+    include_timings: bool = Form(False),
 ) -> ProcessResponse:
     start = time.time()
+    timings = {} if include_timings else None
+    if executor.is_saturated():
+        return saturated_response(ExecutorSaturatedError(executor.stats()))
+    options = build_options(
+        blur_amount, blur_type, object_types, keyframe_interval, track_padding,
+        precision, adaptive_resolution, latency_budget_ms, min_face_size,
+        blur_mode,
+    )
+    if options is None:
+        return ErrorResponse(
+            success=False,
+            error_message="Unsupported blur type",
+        )
     try:
-        contents = await file.read()
-        file_ext = file.filename.split(".")[-1].lower()
         filename = file.filename
         file_path = os.path.join(UPLOAD_FOLDER, filename)
-        with open(file_path, "wb") as f:
-            f.write(contents)
-
-        blur_map = {
-            "gaus": "gaussian",
-            "gaussian": "gaussian",
-            "motion": "motion",
-            "pixelization": "pixelate",
-            "pixelate": "pixelate",
-        }
-        mapped_blur = blur_map.get(blur_type.lower())
-        if not mapped_blur:
-            return ErrorResponse(
-                success=False,
-                error_message="Unsupported blur type",
-            )
-
-        # Создаем объект Options
-        from app.schemas.uploadfile import Options
-        object_types_list = [obj.strip() for obj in object_types.split(",") if obj.strip()]
-        options = Options(
-            blur_type=mapped_blur,
-            intensity=blur_amount,
-            object_types=object_types_list
+        _, content_hash = await save_upload_file(
+            file, file_path, settings.max_upload_size, settings.upload_chunk_size
         )
 
-        processed_path = detector.process_file(
-            file_path,
-            options.object_types,
-            options.intensity,
-            options.blur_type,
+        processed_path = await executor.run(
+            _process, file_path, options, content_hash, timings
         )
         processed_size = os.path.getsize(processed_path)
         processing_time_ms = int((time.time() - start) * 1000)
@@ -99,7 +326,108 @@ async def upload_file(
             processed_path=processed_path,
             processed_size=processed_size,
             processing_time_ms=processing_time_ms,
+            timings=timings,
         )
+    except ExecutorSaturatedError as e:
+        return saturated_response(e)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
     except Exception as e:
         return ErrorResponse(success=False, error_message=str(e))
 
+
+@router.post("/process/batch", response_model=BatchProcessResponse)
+async def process_batch(request: BatchProcessRequest):
+    start = time.time()
+    if len(request.requests) > settings.max_batch_files:
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error_message": f"Не больше {settings.max_batch_files} файлов"},
+        )
+    try:
+        results = await _run_batch(
+            [(item.file_path, item.options, None) for item in request.requests]
+        )
+    except ExecutorSaturatedError as e:
+        return saturated_response(e)
+    return BatchProcessResponse(
+        results=results, processing_time_ms=int((time.time() - start) * 1000)
+    )
+
+
+@router.post("/uploadfiles", response_model=BatchProcessResponse)
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    blur_amount: int = Form(..., ge=1, le=10),
+    blur_type: str = Form(...),
+    object_types: str = Form(...),
+    keyframe_interval: int = Form(1, ge=1, le=60),
+    track_padding: float = Form(0.15, ge=0.0, le=1.0),
+    precision: FormPrecision = Form(None),
+    adaptive_resolution: bool = Form(False),
+    latency_budget_ms: Optional[int] = Form(None, ge=1),
+    min_face_size: Optional[int] = Form(None, ge=4),
+    blur_mode: Literal["box", "mask"] = Form("box"),
+):
+    """Пакетная загрузка: одинаковые параметры для всех файлов."""
+    start = time.time()
+    if len(files) > settings.max_batch_files:
+        return JSONResponse(
+            status_code=413,
+            content={"success": False, "error_message": f"Не больше {settings.max_batch_files} файлов"},
+        )
+    if executor.is_saturated():
+        return saturated_response(ExecutorSaturatedError(executor.stats()))
+
+    options = build_options(
+        blur_amount, blur_type, object_types, keyframe_interval, track_padding,
+        precision, adaptive_resolution, latency_budget_ms, min_face_size,
+        blur_mode,
+    )
+    if options is None:
+        return ErrorResponse(success=False, error_message="Unsupported blur type")
+
+    items = []
+    # Остаток суммарного размера пакета (тело без Content-Length не
+    # проверяется middleware)
+    remaining = settings.max_batch_upload_size
+    try:
+        for file in files:
+            # Уникальные имена: в пакете могут быть файлы с одинаковыми именами
+            file_ext = file.filename.split(".")[-1].lower()
+            file_path = os.path.join(UPLOAD_FOLDER, generate_name_file(file.filename, file_ext))
+            size, content_hash = await save_upload_file(
+                file, file_path, min(settings.max_upload_size, remaining),
+                settings.upload_chunk_size,
+            )
+            remaining -= size
+            items.append((file_path, options, content_hash))
+        results = await _run_batch(items)
+    except ExecutorSaturatedError as e:
+        return saturated_response(e)
+    except UploadTooLargeError as e:
+        return too_large_response(e)
+    return BatchProcessResponse(
+        results=results, processing_time_ms=int((time.time() - start) * 1000)
+    )
+
+
+@router.get("/models")
+async def models_report() -> dict:
+    """Загруженные в процессе модели, оценка их памяти и работа микробатчинга."""
+    report = get_model_registry().memory_report()
+    batcher = get_micro_batcher()
+    report["micro_batch"] = batcher.stats() if batcher is not None else {"enabled": False}
+    return report
+
+
+@router.get("/cache")
+async def cache_stats() -> dict:
+    """Счетчики кэшей результатов и детекций (попадания, промахи, размер)."""
+    stats = {}
+    for name, cache in (
+        ("results", get_result_cache()),
+        ("detections", get_detection_cache()),
+    ):
+        stats[name] = cache.stats() if cache is not None else {"enabled": False}
+    return stats
@@ -1,6 +1,11 @@
-from typing import List, Literal, Union
+from typing import Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from app.ml.tools.quantization import int8_available
+
+# Точность весов моделей
+Precision = Literal["fp32", "fp16", "int8-dynamic", "int8-static"]
 
 
 class Options(BaseModel):
@@ -8,7 +13,31 @@ class Options(BaseModel):
 
     blur_type: Literal["gaussian", "motion", "pixelate"]
     intensity: int = Field(..., ge=1, le=10)
+    # Форма размытия: прямоугольники боксов или вписанные в них эллипсы,
+    # размываемые за один проход через общую маску кадра
+    blur_mode: Literal["box", "mask"] = "box"
+    # Пустой список означает детекцию всех классов всех моделей
     object_types: List[str] = Field(default_factory=list)
+    # Для видео: детекция на каждом K-м кадре, между ними - трекинг боксов
+    keyframe_interval: int = Field(1, ge=1, le=60)
+    # Доля размера бокса, на которую расширяется область размытия при трекинге
+    track_padding: float = Field(0.15, ge=0.0, le=1.0)
+    # Точность весов моделей, None - значение по умолчанию из настроек сервиса
+    precision: Optional[Precision] = None
+    # Адаптивный выбор размера входа и модели по разрешению файла, бюджету
+    # времени инференса кадра и минимальному размеру лица (в пикселях файла);
+    # для больших изображений с мелкими лицами используются плитки
+    adaptive_resolution: bool = False
+    latency_budget_ms: Optional[int] = Field(None, ge=1)
+    min_face_size: Optional[int] = Field(None, ge=4)
+
+    @field_validator("precision")
+    @classmethod
+    def check_int8_packages(cls, value: Optional[str]) -> Optional[str]:
+        """INT8 отклоняется сразу (422), если пакеты квантования не установлены"""
+        if value is not None and value.startswith("int8") and not int8_available():
+            raise ValueError("Для INT8 требуются пакеты onnx и onnxruntime")
+        return value
 
 
 class ProcessRequest(BaseModel):
@@ -18,6 +47,14 @@ class ProcessRequest(BaseModel):
     file_path: str
     mime_type: str
     options: Options
+    # Вернуть в ответе время стадий обработки (timings)
+    include_timings: bool = False
+
+
+class BatchProcessRequest(BaseModel):
+    """Пакетный запрос: несколько уже загруженных файлов."""
+
+    requests: List[ProcessRequest] = Field(..., min_length=1)
 
 
 class SuccessResponse(BaseModel):
@@ -27,6 +64,9 @@ class SuccessResponse(BaseModel):
     processed_path: str
     processed_size: int
     processing_time_ms: int
+    # Время стадий в секундах (decode, inference, blur, encode, audio_mux,
+    # вызовы моделей, total) и число кадров видео, если запрошено
+    timings: Optional[Dict[str, float]] = None
 
 
 class ErrorResponse(BaseModel):
@@ -38,3 +78,66 @@ class ErrorResponse(BaseModel):
 
 ProcessResponse = Union[SuccessResponse, ErrorResponse]
 
+
+class BatchProcessResponse(BaseModel):
+    """Результаты пакетной обработки в порядке файлов запроса."""
+
+    results: List[ProcessResponse]
+    processing_time_ms: int
+
+
+class JobSubmitResponse(BaseModel):
+    """Ответ на постановку файла в очередь обработки."""
+
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    """Состояние задачи обработки."""
+
+    job_id: str
+    filename: str
+    job_class: Literal["image", "video"]
+    # Оценка объема работы в мегапикселях, определяет порядок в очереди
+    estimated_cost: float
+    status: Literal["pending", "processing", "completed", "error", "cancelled"]
+    added_time: float
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    wait_time: Optional[float] = None
+    service_time: Optional[float] = None
+    # Для видео - обработанные/все кадры, для изображений - 0/1 или 1/1
+    progress_done: int = 0
+    progress_total: Optional[int] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    # После обработки: число кадров (1 для изображения), боксов на всех
+    # кадрах и время стадий в секундах
+    frames: Optional[int] = None
+    detections: Optional[int] = None
+    detections_per_frame: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None
+    # Профилирование задачи и путь к профилю cProfile (рядом лежит .prof.txt)
+    profile: bool = False
+    profile_path: Optional[str] = None
+
+
+class JobCancelResponse(BaseModel):
+    """Результат отмены задачи."""
+
+    job_id: str
+    cancelled: bool
+
+
+class JobClassStats(BaseModel):
+    """Статистика очереди одного класса задач, время в секундах."""
+
+    pending: int
+    completed: int
+    errors: int
+    cancelled: int
+    wait_avg: float
+    wait_max: float
+    service_avg: float
+    service_max: float
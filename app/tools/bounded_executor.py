@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturatedError(Exception):
+    """Пул переполнен: все потоки заняты и очередь ожидания заполнена"""
+
+    def __init__(self, stats: Dict[str, int]):
+        super().__init__("Сервис перегружен, повторите запрос позже")
+        self.stats = stats
+
+
+class BoundedExecutor:
+    """
+    Пул потоков для синхронной обработки файлов вне event loop.
+
+    Ограничивает число одновременно выполняемых задач (max_workers) и число
+    задач в очереди ожидания (max_queue). Если свободного места нет, submit
+    сразу выбрасывает ExecutorSaturatedError вместо бесконечного ожидания.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 4):
+        """
+        Инициализация пула
+
+        Args:
+            max_workers: Количество потоков обработки
+            max_queue: Максимальное число задач, ожидающих свободного потока
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="detector"
+        )
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Текущая загрузка пула"""
+        with self._lock:
+            return self._stats_unlocked()
+
+    def is_saturated(self) -> bool:
+        """Нет места ни в пуле, ни в очереди ожидания"""
+        with self._lock:
+            return self._submitted >= self.max_workers + self.max_queue
+
+    def _stats_unlocked(self) -> Dict[str, int]:
+        return {
+            "running": self._running,
+            "queue_depth": self._submitted - self._running,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+        }
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Поставить задачу в пул
+
+        Raises:
+            ExecutorSaturatedError: Если пул и очередь ожидания заполнены
+        """
+        with self._lock:
+            if self._submitted >= self.max_workers + self.max_queue:
+                raise ExecutorSaturatedError(self._stats_unlocked())
+            self._submitted += 1
+
+        future = self._executor.submit(self._call, fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Выполнить функцию в пуле и дождаться результата, не блокируя event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self._submitted -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
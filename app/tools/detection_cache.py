@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.ml.tools.detections import Detections
+from app.ml.tools.write_box import Boxes
+from app.tools.result_cache import ResultCache
+
+
+def boxes_to_columns(frames_boxes: List[Boxes]) -> Dict[str, np.ndarray]:
+    """
+    Перевод боксов по кадрам в колоночный вид
+
+    Args:
+        frames_boxes: Боксы для каждого кадра (для изображения - один)
+
+    Returns:
+        Массивы одинаковой длины по всем боксам: frame (номер кадра),
+        xyxy (координаты), conf, cls, name (индекс в names), а также
+        names (имена классов) и frames (число кадров)
+    """
+    frames = [Detections.from_dicts(boxes_info) for boxes_info in frames_boxes]
+    merged = Detections.concat(frames)
+    names, name = np.unique(merged.names.astype(str), return_inverse=True)
+
+    return {
+        "frame": np.repeat(
+            np.arange(len(frames), dtype=np.int32), [len(d) for d in frames]
+        ),
+        "xyxy": merged.xyxy,
+        "conf": merged.conf,
+        "cls": merged.cls.astype(np.int16),
+        "name": name.astype(np.int16),
+        "names": names,
+        "frames": np.asarray(len(frames), dtype=np.int64),
+    }
+
+
+def columns_to_boxes(columns: Dict[str, np.ndarray]) -> List[Detections]:
+    """Обратный перевод колоночного вида в боксы по кадрам"""
+    frames = int(columns["frames"])
+    names = columns["names"].astype(object)
+    detections = Detections(
+        columns["xyxy"], columns["conf"], columns["cls"], names[columns["name"]]
+    )
+    # Боксы записаны по возрастанию номера кадра
+    bounds = np.searchsorted(columns["frame"], np.arange(frames + 1))
+    return [
+        detections.select(slice(start, end))
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+    ]
+
+
+class DetectionCache(ResultCache):
+    """
+    Кэш результатов детекции на диске.
+
+    Хранит боксы по кадрам в сжатом .npz в колоночном виде, чтобы повторная
+    обработка того же файла с другим размытием пропускала инференс.
+    Размер и вытеснение устроены так же, как у ResultCache.
+    """
+
+    def __init__(self, cache_dir: str = "cache/detections", max_size: int = 1024 ** 3):
+        super().__init__(cache_dir, max_size)
+
+    def load(self, key: str) -> Optional[List[Detections]]:
+        """Боксы по кадрам или None при промахе"""
+        path = self.get(key)
+        if path is None:
+            return None
+        with np.load(path) as data:
+            return columns_to_boxes(dict(data))
+
+    def save(self, key: str, frames_boxes: List[Boxes]) -> None:
+        """Сохранить боксы по кадрам"""
+        fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            np.savez_compressed(tmp_path, **boxes_to_columns(frames_boxes))
+            self.put(key, tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+
+_detection_cache: Optional[DetectionCache] = None
+_detection_cache_lock = threading.Lock()
+
+
+def get_detection_cache() -> Optional[DetectionCache]:
+    """Общий кэш детекций процесса, None если он отключен в настройках"""
+    global _detection_cache
+    from app.config import settings
+
+    if settings.detection_cache_max_size <= 0:
+        return None
+    with _detection_cache_lock:
+        if _detection_cache is None:
+            _detection_cache = DetectionCache(
+                settings.detection_cache_dir, settings.detection_cache_max_size
+            )
+    return _detection_cache
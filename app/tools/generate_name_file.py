@@ -13,6 +13,14 @@ def generate_name_file(data: str, extension:str) -> str:
     file_name = f"{hash_hex}_{unique_id}.{extension}"
     return file_name
 
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    # Хэш sha256 содержимого файла, файл читается частями
+    hash_object = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hash_object.update(chunk)
+    return hash_object.hexdigest()
+
 if __name__ == '__main__':
     example_data = "example data"
     print(generate_name_file(example_data))
@@ -0,0 +1,53 @@
+import cProfile
+import io
+import pstats
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# Суффиксы файлов профиля
+PROFILE_SUFFIX = ".prof"
+SUMMARY_SUFFIX = ".prof.txt"
+
+
+class JobProfiler:
+    """
+    Детерминированный профиль (cProfile) одной обработки файла
+
+    Профилируется поток, вызвавший run(): инференс моделей и вызовы
+    конвейера. Декодирование, размытие и кодирование видео выполняются
+    в отдельных потоках конвейера и видны в профиле как ожидание очередей,
+    их время отражают стадии timings; работа воркеров сегментного режима
+    идет в других процессах. Профиль всего процесса можно снять внешним
+    семплирующим профилировщиком (py-spy).
+    """
+
+    def __init__(self):
+        self._profiler = cProfile.Profile()
+
+    def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Вызов fn под профилировщиком"""
+        return self._profiler.runcall(fn, *args, **kwargs)
+
+    def save(self, base_path: str, top: int = 50) -> str:
+        """
+        Сохранение профиля по пути base_path с суффиксами
+
+        Args:
+            base_path: Путь без суффикса (каталог профилей и id задачи)
+            top: Сколько функций с наибольшим накопленным временем
+                выводится в текстовую сводку
+
+        Returns:
+            Путь к файлу профиля (.prof, читается pstats и snakeviz);
+            рядом записывается текстовая сводка (.prof.txt)
+        """
+        profile_path = base_path + PROFILE_SUFFIX
+        self._profiler.dump_stats(profile_path)
+
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        with open(base_path + SUMMARY_SUFFIX, "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        return profile_path
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """Жесткая ссылка на файл, а если она невозможна - копия"""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ResultCache:
+    """
+    Кэш обработанных файлов на диске.
+
+    Ключ строится из хэша содержимого исходного файла и всех параметров,
+    влияющих на результат. Размер кэша ограничен, при переполнении удаляются
+    давно не использованные записи (LRU). Порядок использования хранится во
+    времени изменения файлов, поэтому переживает перезапуск сервиса.
+    """
+
+    def __init__(self, cache_dir: str = "cache/results", max_size: int = 5 * 1024 ** 3):
+        """
+        Инициализация кэша
+
+        Args:
+            cache_dir: Папка для хранения результатов
+            max_size: Максимальный суммарный размер файлов кэша в байтах
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        files = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+        files = [path for path in files if os.path.isfile(path)]
+        for path in sorted(files, key=os.path.getmtime):
+            key = os.path.splitext(os.path.basename(path))[0]
+            size = os.path.getsize(path)
+            self._entries[key] = (path, size)
+            self._size += size
+
+    @staticmethod
+    def make_key(content_hash: str, params: Dict[str, Any]) -> str:
+        """
+        Ключ кэша
+
+        Args:
+            content_hash: Хэш содержимого исходного файла
+            params: Параметры обработки и версии моделей
+
+        Returns:
+            sha256 от хэша содержимого и отсортированных параметров
+        """
+        payload = json.dumps([content_hash, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Путь к закэшированному результату или None при промахе"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            os.utime(entry[0])
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, result_path: str) -> Optional[str]:
+        """
+        Сохранить результат в кэш
+
+        Args:
+            key: Ключ из make_key()
+            result_path: Путь к обработанному файлу
+
+        Returns:
+            Путь к файлу в кэше или None, если файл больше всего кэша
+        """
+        size = os.path.getsize(result_path)
+        if size > self.max_size:
+            return None
+
+        ext = os.path.splitext(result_path)[-1]
+        cached_path = os.path.join(self.cache_dir, f"{key}{ext}")
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            link_or_copy(result_path, cached_path)
+            self._entries[key] = (cached_path, size)
+            self._size += size
+
+            while self._size > self.max_size and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return cached_path
+
+    def _remove(self, key: str) -> None:
+        path, size = self._entries.pop(key)
+        self._size -= size
+        if os.path.exists(path):
+            os.remove(path)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий и промахов, число и размер записей"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Общий кэш результатов процесса, None если он отключен в настройках"""
+    global _result_cache
+    from app.config import settings
+
+    if settings.result_cache_max_size <= 0:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                settings.result_cache_dir, settings.result_cache_max_size
+            )
+    return _result_cache
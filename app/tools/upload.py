@@ -0,0 +1,70 @@
+import hashlib
+import os
+from typing import Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+
+class UploadTooLargeError(Exception):
+    """Загружаемый файл превышает допустимый размер"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Файл превышает максимальный размер {max_size} байт")
+        self.max_size = max_size
+
+
+def _write_chunk(f, hasher, chunk: bytes) -> None:
+    """Запись части файла и обновление хэша (выполняется в пуле потоков)"""
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload_file(
+    file: UploadFile,
+    file_path: str,
+    max_size: int,
+    chunk_size: int = 1024 * 1024,
+) -> Tuple[int, str]:
+    """
+    Потоковая запись загружаемого файла на диск.
+
+    Файл читается и записывается частями по chunk_size байт, поэтому в
+    памяти не держится целиком. Одновременно считается sha256 содержимого;
+    запись и хэширование частей выполняются в пуле потоков, чтобы не
+    блокировать event loop.
+    При превышении max_size запись прерывается, а частичный файл удаляется.
+
+    Args:
+        file: Загружаемый файл
+        file_path: Путь для сохранения
+        max_size: Максимальный размер файла в байтах
+        chunk_size: Размер читаемой части в байтах
+
+    Returns:
+        Размер файла в байтах и sha256 содержимого в hex
+
+    Raises:
+        UploadTooLargeError: Если файл больше max_size
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    # Прежний файл удаляется, а не перезаписывается: на него могут
+    # ссылаться жесткие ссылки (результат без детекций, кэш результатов)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                await run_in_threadpool(_write_chunk, f, hasher, chunk)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, hasher.hexdigest()
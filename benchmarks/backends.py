@@ -0,0 +1,129 @@
+"""Сравнение бэкендов инференса: совпадение боксов с torch и скорость.
+
+Каждый бэкенд (при необходимости экспортированный рядом с весами)
+прогоняется на одних и тех же изображениях. Для скорости выводятся
+средняя задержка одного изображения и пропускная способность батчами,
+для совпадения - доля боксов torch, найденных бэкендом с IoU не ниже
+порога, число лишних боксов и средняя разница уверенности.
+
+Без ``--images`` используются синтетические кадры: на них модель лиц
+почти ничего не находит, поэтому для проверки совпадения лучше передать
+каталог с реальными фотографиями.
+
+Запуск: ``python -m benchmarks.backends --backends torch onnx openvino --images photos/``
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from app.ml.tools.detections import Detections
+from app.ml.tools.model import BACKENDS, Model
+from benchmarks.synthetic import make_frames
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inference backend parity and speed")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default="models/yolov11m-face.pt")
+    parser.add_argument("--images", help="Каталог с изображениями для сравнения")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.9)
+    return parser.parse_args()
+
+
+def load_images(args: argparse.Namespace) -> List[np.ndarray]:
+    if not args.images:
+        return make_frames(args.width, args.height, args.frames)
+    images = []
+    for name in sorted(os.listdir(args.images)):
+        image = cv2.imread(os.path.join(args.images, name))
+        if image is not None:
+            images.append(image)
+    if not images:
+        raise SystemExit(f"В {args.images} нет изображений")
+    return images
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Матрица IoU между боксами xyxy из a и b"""
+    a = a.astype(np.float32)[:, None]
+    b = b.astype(np.float32)[None, :]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def compare(
+    reference: List[Detections], candidate: List[Detections], iou_threshold: float
+) -> Dict[str, float]:
+    """Жадное сопоставление боксов кандидата с эталонными по IoU"""
+    total = matched = extra = 0
+    conf_diff: List[float] = []
+    for ref, cand in zip(reference, candidate):
+        total += len(ref)
+        used = set()
+        if len(ref) and len(cand):
+            iou = box_iou(ref.xyxy, cand.xyxy)
+            for i in np.argsort(-ref.conf):
+                j = int(np.argmax(iou[i]))
+                if iou[i, j] >= iou_threshold and j not in used:
+                    used.add(j)
+                    matched += 1
+                    conf_diff.append(abs(float(ref.conf[i] - cand.conf[j])))
+                    iou[:, j] = 0
+        extra += len(cand) - len(used)
+    return {
+        "boxes": total,
+        "recall": matched / total if total else 1.0,
+        "extra": extra,
+        "conf_diff": float(np.mean(conf_diff)) if conf_diff else 0.0,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    images = load_images(args)
+    detections: Dict[str, List[Detections]] = {}
+
+    print(f"{'backend':>9} {'latency_ms':>11} {'batch_fps':>10} {'boxes':>6} "
+          f"{'recall':>7} {'extra':>6} {'conf_diff':>10}")
+    # torch первым, чтобы остальные бэкенды сравнивались с ним
+    for backend in sorted(args.backends, key=lambda name: name != "torch"):
+        model = Model(args.model, args.confidence, backend)
+        model.load_model()
+        model.predict(images[:1])  # прогрев
+
+        found = []
+        start = time.perf_counter()
+        for image in images:
+            found.append(model.extract_detections(model.predict(image)[0]))
+        latency = (time.perf_counter() - start) / len(images)
+
+        start = time.perf_counter()
+        for i in range(0, len(images), args.batch_size):
+            model.predict(images[i:i + args.batch_size])
+        fps = len(images) / (time.perf_counter() - start)
+
+        detections[backend] = found
+        reference = next(iter(detections.values()))
+        parity = compare(reference, found, args.iou)
+        print(f"{backend:>9} {latency * 1000:>11.1f} {fps:>10.1f} {parity['boxes']:>6} "
+              f"{parity['recall']:>7.3f} {parity['extra']:>6} {parity['conf_diff']:>10.4f}")
+
+    if "torch" not in args.backends:
+        print("torch не указан: совпадение считается относительно первого бэкенда")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,147 @@
+"""Микробенчмарк размытия боксов: прежняя реализация против BoxProcessor.
+
+Для разных типов размытия, числа и размера боксов замеряется время
+``draw_boxes`` на кадре Full HD: прежний вариант (копия кадра, плотное
+ядро k x k для motion, гауссово размытие в полном разрешении) и текущий
+(одномерное ядро, уменьшение больших ROI, размытие на месте, объединение
+пересекающихся боксов). Также выводятся время без объединения боксов,
+доля пикселей, которые объединение избавило от повторного размытия, и
+PSNR текущего результата относительно прежнего внутри боксов, чтобы
+проверить визуальную эквивалентность. Колонка mask_ms - режим маски
+(эллипсы, одно размытие на кадр), его время почти не зависит от числа боксов.
+
+Запуск: ``python -m benchmarks.blur --counts 1 8 32 --sizes 32 128 512``
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import cv2
+import numpy as np
+
+from app.ml.tools.write_box import BoxProcessor
+from benchmarks.synthetic import make_frame
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Box blur micro-benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 128, 512])
+    parser.add_argument("--intensities", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--blur-types", nargs="+", default=["gaussian", "motion", "pixelate"])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeats", type=int, default=20)
+    return parser.parse_args()
+
+
+def legacy_draw_boxes(image, boxes_info, intensity=5, blur_type="gaussian"):
+    """Прежняя реализация draw_boxes для сравнения"""
+    result_image = image.copy()
+    for box in boxes_info:
+        x_min, y_min, x_max, y_max = box["coordinates"]
+        roi = result_image[y_min:y_max, x_min:x_max]
+        if blur_type == "pixelate":
+            h, w = roi.shape[:2]
+            factor = max(1, intensity * 5)
+            temp = cv2.resize(roi, (max(1, w // factor), max(1, h // factor)),
+                              interpolation=cv2.INTER_LINEAR)
+            blurred_roi = cv2.resize(temp, (w, h), interpolation=cv2.INTER_NEAREST)
+        elif blur_type == "motion":
+            k = intensity * 2 + 1
+            kernel = np.zeros((k, k))
+            kernel[int((k - 1) / 2), :] = 1.0 / k
+            blurred_roi = cv2.filter2D(roi, -1, kernel)
+        else:
+            k = intensity * 2 + 1
+            blurred_roi = cv2.GaussianBlur(roi, (k, k), 0)
+        result_image[y_min:y_max, x_min:x_max] = blurred_roi
+    return result_image
+
+
+def make_boxes(width: int, height: int, count: int, size: int, seed: int = 0) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for _ in range(count):
+        x = int(rng.integers(0, max(1, width - size)))
+        y = int(rng.integers(0, max(1, height - size)))
+        boxes.append({
+            "coordinates": [x, y, min(width, x + size), min(height, y + size)],
+            "confidence": 0.9, "class_id": 0, "class_name": "face",
+        })
+    return boxes
+
+
+def measure(draw: Callable[[], np.ndarray], repeats: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    draw()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        draw()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def roi_psnr(a: np.ndarray, b: np.ndarray, boxes: List[dict]) -> float:
+    mask = np.zeros(a.shape[:2], dtype=bool)
+    for box in boxes:
+        x_min, y_min, x_max, y_max = box["coordinates"]
+        mask[y_min:y_max, x_min:x_max] = True
+    mse = np.mean((a[mask].astype(np.float32) - b[mask].astype(np.float32)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def run(args: argparse.Namespace) -> None:
+    frame = make_frame(args.width, args.height, objects=40)
+    print(f"{'blur':>9} {'k':>3} {'boxes':>6} {'size':>5} {'legacy_ms':>10} "
+          f"{'copy_ms':>8} {'nomerge_ms':>11} {'inplace_ms':>11} {'speedup':>8} "
+          f"{'saved_%':>8} {'psnr_db':>8} {'mask_ms':>8}")
+    for blur_type in args.blur_types:
+        for intensity in args.intensities:
+            for count in args.counts:
+                for size in args.sizes:
+                    boxes = make_boxes(args.width, args.height, count, size)
+                    legacy = measure(
+                        lambda: legacy_draw_boxes(frame, boxes, intensity, blur_type),
+                        args.repeats,
+                    )
+                    copied = measure(
+                        lambda: BoxProcessor.draw_boxes(frame, boxes, intensity, blur_type),
+                        args.repeats,
+                    )
+                    unmerged = measure(
+                        lambda: BoxProcessor.draw_boxes(
+                            frame, boxes, intensity, blur_type, merge=False
+                        ),
+                        args.repeats,
+                    )
+                    # Размытие на месте портит кадр, поэтому каждому вызову - своя копия,
+                    # время копирования вычитается
+                    frames = [frame.copy() for _ in range(args.repeats + 1)]
+                    inplace = measure(
+                        lambda: BoxProcessor.draw_boxes(
+                            frames.pop(), boxes, intensity, blur_type, inplace=True
+                        ),
+                        args.repeats,
+                    )
+                    masked = measure(
+                        lambda: BoxProcessor.draw_mask(frame, boxes, intensity, blur_type),
+                        args.repeats,
+                    )
+                    stats = {}
+                    psnr = roi_psnr(
+                        legacy_draw_boxes(frame, boxes, intensity, blur_type),
+                        BoxProcessor.draw_boxes(
+                            frame, boxes, intensity, blur_type, stats=stats
+                        ),
+                        boxes,
+                    )
+                    saved = 1 - stats["blurred_pixels"] / max(1, stats["box_pixels"])
+                    print(f"{blur_type:>9} {intensity * 2 + 1:>3} {count:>6} {size:>5} "
+                          f"{legacy:>10.2f} {copied:>8.2f} {unmerged:>11.2f} "
+                          f"{inplace:>11.2f} {legacy / inplace:>8.1f} "
+                          f"{saved * 100:>8.1f} {psnr:>8.1f} {masked:>8.2f}")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,70 @@
+"""Пропускная способность пакетной обработки изображений с микробатчингом.
+
+Небольшие изображения обрабатываются ``detect_objects`` двумя способами:
+по одному (прежний путь: отдельный вызов модели на каждое изображение)
+и из нескольких потоков через общий ``MicroBatcher``, который собирает
+одновременные изображения в один батч. Для каждого сочетания размера
+батча и времени ожидания выводятся изображения в секунду, ускорение
+относительно пути по одному и средний размер собранного батча.
+
+Запуск: ``python -m benchmarks.micro_batch --images 128 --batch-sizes 4 8 16 --waits 2 5 10``
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.ml.tools.micro_batcher import MicroBatcher
+from app.ml.tools.object_detector import MLObjectDetector
+from benchmarks.synthetic import make_frame
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-batching throughput benchmark")
+    parser.add_argument("--images", type=int, default=128)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--waits", type=float, nargs="+", default=[2.0, 5.0, 10.0],
+                        help="Время ожидания батча, мс")
+    parser.add_argument("--object-types", default="face")
+    return parser.parse_args()
+
+
+def run(args: argparse.Namespace) -> None:
+    object_types = [t.strip() for t in args.object_types.split(",") if t.strip()]
+    images = [make_frame(args.width, args.height, i, seed=i) for i in range(args.images)]
+
+    single = MLObjectDetector()
+    single.initialize()
+    single.detect_objects(images[0], object_types, 5, "gaussian")  # прогрев
+
+    start = time.perf_counter()
+    for image in images:
+        single.detect_objects(image, object_types, 5, "gaussian")
+    baseline = len(images) / (time.perf_counter() - start)
+
+    print(f"{'batch':>6} {'wait_ms':>8} {'images/s':>9} {'speedup':>8} {'avg_batch':>10}")
+    print(f"{1:>6} {0:>8.1f} {baseline:>9.1f} {1.0:>8.2f} {1.0:>10.1f}")
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.waits:
+            batcher = MicroBatcher(batch_size, wait_ms)
+            # Модели общие (ModelRegistry), детекторы отличаются только батчером
+            detector = MLObjectDetector(micro_batcher=batcher)
+            detector.initialize()
+
+            with ThreadPoolExecutor(max_workers=batch_size) as pool:
+                start = time.perf_counter()
+                list(pool.map(
+                    lambda image: detector.detect_objects(image, object_types, 5, "gaussian"),
+                    images,
+                ))
+                throughput = len(images) / (time.perf_counter() - start)
+
+            stats = batcher.stats()
+            print(f"{batch_size:>6} {wait_ms:>8.1f} {throughput:>9.1f} "
+                  f"{throughput / baseline:>8.2f} {stats['avg_batch_size']:>10.1f}")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,95 @@
+"""Точность и скорость квантованных вариантов моделей относительно FP32.
+
+Для каждого варианта ``бэкенд:точность`` модель загружается (при первом
+запуске экспортируется и квантуется рядом с весами), после чего на одном
+наборе изображений замеряются задержка одного изображения (среднее и p95),
+пропускная способность батчами и полнота боксов относительно torch FP32.
+
+Бенчмарк работает только на CPU и без сети: изображения и калибровка
+берутся из локального каталога ``--images`` (без него - синтетические
+кадры, на которых полнота малоинформативна).
+
+Запуск: ``python -m benchmarks.quantization --images fixtures/faces --model models/yolo11m.pt``
+"""
+
+import argparse
+import os
+import time
+from typing import List
+
+import numpy as np
+
+# ultralytics не должен обращаться к сети (проверки обновлений, загрузки)
+os.environ.setdefault("YOLO_OFFLINE", "true")
+
+from app.ml.tools.detections import Detections
+from app.ml.tools.model import Model
+from benchmarks.backends import compare, load_images
+
+DEFAULT_VARIANTS = ["onnx:fp32", "onnx:int8-dynamic", "onnx:int8-static", "openvino:fp16"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Quantized model accuracy/speed benchmark")
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS,
+                        help="Варианты backend:precision, эталон torch:fp32 добавляется всегда")
+    parser.add_argument("--model", default="models/yolov11m-face.pt")
+    parser.add_argument("--images", help="Каталог с изображениями (и калибровкой int8-static)")
+    parser.add_argument("--calibration", help="Отдельный каталог калибровки")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--confidence", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.5)
+    return parser.parse_args()
+
+
+def model_size(path: str) -> int:
+    """Размер файла или каталога модели в байтах"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    images = load_images(args)
+    calibration_dir = args.calibration or args.images
+    reference: List[Detections] = []
+
+    print(f"{'variant':>20} {'size_mb':>8} {'p50_ms':>7} {'p95_ms':>7} {'batch_fps':>10} "
+          f"{'boxes':>6} {'recall':>7} {'extra':>6}")
+    for variant in ["torch:fp32"] + [v for v in args.variants if v != "torch:fp32"]:
+        backend, precision = variant.split(":")
+        model = Model(args.model, args.confidence, backend, precision, calibration_dir)
+        model.load_model()
+        model.predict(images[:1])  # прогрев
+
+        found = []
+        latencies = []
+        for image in images:
+            start = time.perf_counter()
+            results = model.predict(image)
+            latencies.append(time.perf_counter() - start)
+            found.append(model.extract_detections(results[0]))
+
+        start = time.perf_counter()
+        for i in range(0, len(images), args.batch_size):
+            model.predict(images[i:i + args.batch_size])
+        fps = len(images) / (time.perf_counter() - start)
+
+        if not reference:
+            reference = found
+        parity = compare(reference, found, args.iou)
+        size_mb = model_size(model.export_path or model.model_path) / 1024 ** 2
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f"{variant:>20} {size_mb:>8.1f} {p50:>7.1f} {p95:>7.1f} {fps:>10.1f} "
+              f"{parity['boxes']:>6} {parity['recall']:>7.3f} {parity['extra']:>6}")
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,65 @@
+"""Бенчмарк масштабирования сегментного режима по числу процессов.
+
+Создает синтетическое видео и обрабатывает его ``SegmentedVideoProcessor``
+с числом воркеров от 1 до N, выводя время и ускорение относительно одного
+воркера. Время запуска процессов и загрузки моделей в замер не входит.
+
+Запуск: ``python -m benchmarks.segmented --max-workers 4``
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.ml.tools.segmented import SegmentedVideoProcessor
+from benchmarks.synthetic import write_video
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Segmented video processing benchmark")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--frames", type=int, default=1800)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--object-types", default="face")
+    return parser.parse_args()
+
+
+def run(args: argparse.Namespace) -> None:
+    object_types = [t.strip() for t in args.object_types.split(",") if t.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = write_video(
+            os.path.join(tmp, "synthetic.mp4"), (args.width, args.height), args.frames
+        )
+        output_path = os.path.join(tmp, "synthetic_processed.mp4")
+
+        print(f"{'workers':>8} {'segments':>9} {'seconds':>9} {'fps':>8} {'speedup':>8}")
+        baseline = None
+        for workers in range(1, args.max_workers + 1):
+            processor = SegmentedVideoProcessor(
+                workers=workers, min_segment_frames=args.frames // args.max_workers
+            )
+            segments = processor.plan_segments(video_path)
+            try:
+                # Прогрев: запуск процессов и загрузка моделей
+                list(processor._get_pool().map(int, range(workers)))
+
+                start = time.perf_counter()
+                processor.process_video(
+                    video_path, output_path, segments, object_types, 5, "gaussian"
+                )
+                elapsed = time.perf_counter() - start
+            finally:
+                processor.close()
+
+            baseline = baseline or elapsed
+            print(
+                f"{workers:>8} {len(segments):>9} {elapsed:>9.2f} "
+                f"{args.frames / elapsed:>8.1f} {baseline / elapsed:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run(parse_args())
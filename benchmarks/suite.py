@@ -0,0 +1,402 @@
+"""Офлайн-набор бенчмарков конвейера детекции и размытия с результатами в JSON.
+
+Все данные синтетические (``benchmarks.synthetic``), сеть не нужна:
+HTTP эндпоинты вызываются в процессе через ``TestClient``. Разделы:
+
+- ``model`` - ``Model.predict`` (одно изображение и батч) и
+  ``Model.extract_boxes`` для моделей лиц и общих объектов;
+- ``blur`` - ``BoxProcessor.draw_boxes`` для каждого типа размытия и
+  числа боксов, а также режим маски ``draw_mask``;
+- ``image`` / ``video`` - полные ``process_image`` и ``process_video``
+  со временем стадий; на синтетических кадрах модели почти ничего не
+  находят, поэтому выдача исходного файла без детекций (passthrough)
+  отключена и замеряются размытие и кодирование;
+- ``http`` - ``/api/uploadfile`` и ``/api/process`` при нескольких
+  уровнях параллельных запросов.
+
+Каждая запись результата имеет уникальное имя (``blur/gaussian/box/1920x1080/boxes=8``)
+и время в миллисекундах (mean, p50, p95), поэтому прогоны можно сравнивать:
+с ``--baseline`` записи, у которых среднее время выросло больше чем на
+``--tolerance``, выводятся как регрессии, а код возврата становится 1.
+
+Запуск: ``python -m benchmarks.suite --output bench.json``
+Быстрый прогон со сравнением: ``python -m benchmarks.suite --quick --baseline bench.json``
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ultralytics не должен обращаться к сети (проверки обновлений, загрузки)
+os.environ.setdefault("YOLO_OFFLINE", "true")
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.ml.tools.model import resolve_backend
+from app.ml.tools.model_registry import get_model_registry
+from app.ml.tools.object_detector import (
+    FACE_MODEL_PATH,
+    GENERAL_MODEL_PATH,
+    MLObjectDetector,
+)
+from app.ml.tools.write_box import BoxProcessor
+from benchmarks.blur import make_boxes
+from benchmarks.synthetic import make_frame, write_video
+
+SECTIONS = ("model", "blur", "image", "video", "http")
+STAGES = ("decode", "inference", "blur", "encode", "audio_mux")
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--output", default="bench.json", help="Файл результатов JSON")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+",
+                        default=[(640, 360), (1280, 720), (1920, 1080)])
+    parser.add_argument("--box-counts", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--blur-types", nargs="+", default=["gaussian", "motion", "pixelate"])
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 150],
+                        help="Длительность синтетических видео в кадрах")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--objects", type=int, default=4,
+                        help="Объектов на синтетическом кадре")
+    parser.add_argument("--batch", type=int, default=8, help="Размер батча Model.predict")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=16,
+                        help="Запросов на каждый уровень параллельности")
+    parser.add_argument("--object-types", default="face,person")
+    parser.add_argument("--quick", action="store_true",
+                        help="Одно разрешение, короткое видео, мало повторов")
+    parser.add_argument("--baseline", help="Прошлый JSON для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Допустимый рост среднего времени (доля)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.resolutions = [(640, 360)]
+        args.box_counts = [8]
+        args.durations = [30]
+        args.repeats = 3
+        args.concurrency = [1, 4]
+        args.requests = 8
+    args.object_types = [t.strip() for t in args.object_types.split(",") if t.strip()]
+    return args
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Сводка по замерам в секундах: число, время в мс, операций в секунду"""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "min_ms": float(values.min()),
+        "per_second": float(len(samples) / (values.sum() / 1000)) if values.sum() else 0.0,
+    }
+
+
+def measure(fn: Callable[[], object], repeats: int, warmup: int = 1) -> List[float]:
+    """Время отдельных вызовов fn в секундах после прогрева"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def mean_stages(timings: List[Dict[str, float]]) -> Dict[str, float]:
+    """Среднее время стадий в мс по нескольким прогонам"""
+    return {
+        stage: float(np.mean([t.get(stage, 0.0) for t in timings]) * 1000)
+        for stage in STAGES
+        if any(stage in t for t in timings)
+    }
+
+
+def bench_models(args: argparse.Namespace, tmp: str) -> List[dict]:
+    precision = settings.model_precision
+    backend = resolve_backend(settings.model_backend, precision)
+    registry = get_model_registry()
+    records = []
+    for role, path in (("face", FACE_MODEL_PATH), ("general", GENERAL_MODEL_PATH)):
+        model = registry.get(path, backend, precision, settings.quantization_calibration_dir)
+        model.ensure_loaded()
+        for width, height in args.resolutions:
+            images = [
+                make_frame(width, height, i, args.objects, seed=i) for i in range(args.batch)
+            ]
+            size = f"{width}x{height}"
+            records.append({
+                "name": f"model/{role}/predict/{size}",
+                **summarize(measure(lambda: model.predict(images[0]), args.repeats)),
+            })
+            batch = summarize(measure(lambda: model.predict(images), args.repeats))
+            records.append({
+                "name": f"model/{role}/predict_batch/{size}",
+                "batch": args.batch,
+                **batch,
+                "images_per_second": batch["per_second"] * args.batch,
+            })
+            results = model.predict(images[0])
+            records.append({
+                "name": f"model/{role}/extract_boxes/{size}",
+                "boxes": len(model.extract_boxes(results)),
+                **summarize(measure(lambda: model.extract_boxes(results), args.repeats)),
+            })
+    return records
+
+
+def bench_blur(args: argparse.Namespace, tmp: str) -> List[dict]:
+    records = []
+    for width, height in args.resolutions:
+        frame = make_frame(width, height, objects=40)
+        box_size = max(16, min(width, height) // 8)
+        for count in args.box_counts:
+            boxes = make_boxes(width, height, count, box_size)
+            for blur_type in args.blur_types:
+                prefix = f"blur/{blur_type}"
+                suffix = f"{width}x{height}/boxes={count}"
+                records.append({
+                    "name": f"{prefix}/box/{suffix}",
+                    **summarize(measure(
+                        lambda: BoxProcessor.draw_boxes(frame, boxes, 5, blur_type),
+                        args.repeats,
+                    )),
+                })
+                records.append({
+                    "name": f"{prefix}/mask/{suffix}",
+                    **summarize(measure(
+                        lambda: BoxProcessor.draw_mask(frame, boxes, 5, blur_type),
+                        args.repeats,
+                    )),
+                })
+    return records
+
+
+def bench_image(args: argparse.Namespace, tmp: str) -> List[dict]:
+    detector = MLObjectDetector(passthrough=False)
+    detector.initialize()
+    records = []
+    for width, height in args.resolutions:
+        path = os.path.join(tmp, f"image_{width}x{height}.jpg")
+        cv2.imwrite(path, make_frame(width, height, objects=args.objects))
+        timings: List[Dict[str, float]] = []
+
+        def run_once():
+            stage_timings: Dict[str, float] = {}
+            detector.process_image(
+                path, args.object_types, 5, "gaussian", timings=stage_timings
+            )
+            timings.append(stage_timings)
+
+        samples = measure(run_once, args.repeats)
+        records.append({
+            "name": f"image/process_image/{width}x{height}",
+            **summarize(samples),
+            "stages_ms": mean_stages(timings[1:]),
+        })
+    return records
+
+
+def bench_video(args: argparse.Namespace, tmp: str) -> List[dict]:
+    detector = MLObjectDetector(passthrough=False)
+    detector.initialize()
+    records = []
+    for width, height in args.resolutions:
+        for frames in args.durations:
+            path = write_video(
+                os.path.join(tmp, f"video_{width}x{height}_{frames}.mp4"),
+                (width, height), frames, args.fps, args.objects,
+            )
+            timings: List[Dict[str, float]] = []
+
+            def run_once():
+                stage_timings: Dict[str, float] = {}
+                detector.process_video(
+                    path, args.object_types, 5, "gaussian", timings=stage_timings
+                )
+                timings.append(stage_timings)
+
+            # Видео долгие: один прогрев и не больше трех замеров
+            samples = measure(run_once, min(args.repeats, 3))
+            summary = summarize(samples)
+            records.append({
+                "name": f"video/process_video/{width}x{height}/frames={frames}",
+                **summary,
+                "frames_per_second": frames * summary["per_second"],
+                "stages_ms": mean_stages(timings[1:]),
+            })
+    return records
+
+
+def bench_http(args: argparse.Namespace, tmp: str) -> List[dict]:
+    from fastapi.testclient import TestClient
+
+    # Приложение пишет загрузки и кэши в относительный каталог uploads,
+    # веса моделей берутся из models текущего каталога
+    models_dir = os.path.abspath("models")
+    os.chdir(tmp)
+    if os.path.isdir(models_dir) and not os.path.exists("models"):
+        os.symlink(models_dir, "models", target_is_directory=True)
+    os.makedirs("uploads", exist_ok=True)
+    # Как и в разделе image, замеряется полная обработка, а не жесткая ссылка
+    settings.no_detection_passthrough = False
+    import app.main
+
+    width, height = args.resolutions[0]
+    form = {"blur_amount": "5", "blur_type": "gaussian",
+            "object_types": ",".join(args.object_types)}
+    options = {"blur_type": "gaussian", "intensity": 5, "object_types": args.object_types}
+    counter = iter(range(10 ** 9))
+
+    def unique_image() -> bytes:
+        # Разное содержимое, чтобы запросы не попадали в кэш результатов
+        index = next(counter)
+        _, buf = cv2.imencode(".jpg", make_frame(width, height, index, args.objects, seed=index))
+        return buf.tobytes()
+
+    def upload(client: TestClient) -> int:
+        response = client.post(
+            "/api/uploadfile",
+            files={"file": (f"bench_{next(counter)}.jpg", unique_image(), "image/jpeg")},
+            data=form,
+        )
+        return response.status_code if response.json().get("success") else 500
+
+    def process(client: TestClient) -> int:
+        path = os.path.join("uploads", f"bench_{next(counter)}.jpg")
+        with open(path, "wb") as f:
+            f.write(unique_image())
+        response = client.post("/api/process", json={
+            "file_id": path, "file_path": path, "mime_type": "image/jpeg", "options": options,
+        })
+        return response.status_code if response.json().get("success") else 500
+
+    records = []
+    with TestClient(app.main.app) as client:
+        upload(client)  # прогрев моделей
+        for name, call in (("uploadfile", upload), ("process", process)):
+            for concurrency in args.concurrency:
+                def timed(_):
+                    start = time.perf_counter()
+                    status = call(client)
+                    return time.perf_counter() - start, status
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    results = list(pool.map(timed, range(args.requests)))
+                wall = time.perf_counter() - start
+                ok = [seconds for seconds, status in results if status == 200]
+                records.append({
+                    "name": f"http/{name}/{width}x{height}/concurrency={concurrency}",
+                    **summarize([seconds for seconds, _ in results]),
+                    "requests_per_second": len(ok) / wall,
+                    "errors": len(results) - len(ok),
+                })
+    return records
+
+
+BENCHMARKS = {
+    "model": bench_models,
+    "blur": bench_blur,
+    "image": bench_image,
+    "video": bench_video,
+    "http": bench_http,
+}
+
+
+def environment() -> dict:
+    """Описание окружения прогона для сравнения результатов"""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "model_backend": settings.model_backend,
+        "model_precision": settings.model_precision,
+    }
+
+
+def compare(records: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """Записи, среднее время которых выросло больше чем на tolerance"""
+    previous = {record["name"]: record for record in baseline}
+    regressions = []
+    for record in records:
+        old = previous.get(record["name"])
+        if old is None or not old.get("mean_ms"):
+            continue
+        ratio = record["mean_ms"] / old["mean_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append({
+                "name": record["name"],
+                "baseline_ms": old["mean_ms"],
+                "mean_ms": record["mean_ms"],
+                "ratio": ratio,
+            })
+    return regressions
+
+
+def run(args: argparse.Namespace) -> int:
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    records: List[dict] = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            for section in args.sections:
+                start = time.perf_counter()
+                section_records = BENCHMARKS[section](args, tmp)
+                records.extend(section_records)
+                print(f"{section}: {len(section_records)} записей, "
+                      f"{time.perf_counter() - start:.1f} с")
+                for record in section_records:
+                    print(f"  {record['name']:<55} {record['mean_ms']:>10.2f} ms "
+                          f"(p95 {record['p95_ms']:.2f})")
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "environment": environment(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+        "results": records,
+    }
+    if baseline is not None:
+        report["regressions"] = compare(records, baseline, args.tolerance)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+    if baseline is not None and report["regressions"]:
+        print(f"Регрессии (рост среднего времени больше {args.tolerance:.0%}):")
+        for regression in report["regressions"]:
+            print(f"  {regression['name']:<55} {regression['baseline_ms']:>10.2f} -> "
+                  f"{regression['mean_ms']:.2f} ms (x{regression['ratio']:.2f})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
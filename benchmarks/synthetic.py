@@ -0,0 +1,74 @@
+"""Генерация синтетических изображений и видео для бенчмарков.
+
+Данные создаются локально, поэтому бенчмарки не требуют сети и
+файлов из ``uploads/``.
+"""
+
+import os
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+
+def make_frame(
+    width: int, height: int, index: int = 0, objects: int = 4, seed: int = 0
+) -> np.ndarray:
+    """Создает кадр с градиентным фоном и движущимися эллипсами.
+
+    Args:
+        width: Ширина кадра
+        height: Высота кадра
+        index: Номер кадра, задает смещение объектов
+        objects: Количество объектов на кадре
+        seed: Зерно генератора для воспроизводимости
+
+    Returns:
+        Кадр в формате BGR
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x[None, :] * 0.5 + y[:, None] * 0.5).astype(np.uint8)
+    frame[..., 1] = x[None, :].astype(np.uint8)
+    frame[..., 2] = y[:, None].astype(np.uint8)
+
+    size = max(8, min(width, height) // 8)
+    for _ in range(objects):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        vx, vy = rng.integers(-6, 7), rng.integers(-6, 7)
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+        center = (int((cx + vx * index) % width), int((cy + vy * index) % height))
+        cv2.ellipse(frame, center, (size // 2, size), 0, 0, 360, color, -1)
+    return frame
+
+
+def make_frames(
+    width: int, height: int, count: int, objects: int = 4, seed: int = 0
+) -> List[np.ndarray]:
+    """Создает последовательность кадров синтетического видео."""
+    return [make_frame(width, height, i, objects, seed) for i in range(count)]
+
+
+def write_video(
+    path: str,
+    resolution: Tuple[int, int] = (640, 360),
+    frames: int = 90,
+    fps: int = 30,
+    objects: int = 4,
+) -> str:
+    """Записывает синтетическое видео в файл и возвращает путь к нему."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    width, height = resolution
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    out = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    try:
+        for i in range(frames):
+            out.write(make_frame(width, height, i, objects))
+    finally:
+        out.release()
+    return path
@@ -0,0 +1,49 @@
+"""Бенчмарк батчевого инференса видео для разных размеров батча.
+
+Кадры синтетического видео один раз загружаются в память, после чего
+для каждого размера батча замеряется скорость ``detect_objects_batch``
+в кадрах в секунду. Декодирование и кодирование видео в замер не входят.
+
+Запуск: ``python -m benchmarks.video_batch --batch-sizes 1 2 4 8 16``
+"""
+
+import argparse
+import time
+
+from app.ml.tools.object_detector import MLObjectDetector
+from benchmarks.synthetic import make_frames
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batched video inference benchmark")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--object-types", default="face,person")
+    return parser.parse_args()
+
+
+def run(args: argparse.Namespace) -> None:
+    detector = MLObjectDetector()
+    detector.initialize()
+
+    object_types = [t.strip() for t in args.object_types.split(",") if t.strip()]
+    frames = make_frames(args.width, args.height, args.frames)
+
+    # Прогрев моделей, чтобы первый замер не включал инициализацию
+    detector.detect_objects_batch(frames[:1], object_types, 5, "gaussian")
+
+    print(f"{'batch':>6} {'frames':>7} {'seconds':>9} {'fps':>8}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            detector.detect_objects_batch(
+                frames[i:i + batch_size], object_types, 5, "gaussian"
+            )
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {len(frames):>7} {elapsed:>9.2f} {len(frames) / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    run(parse_args())